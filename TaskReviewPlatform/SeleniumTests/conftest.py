@@ -1,21 +1,161 @@
+import itertools
+import json
 import os
-from time import sleep
+import time
 import pytest
 from selenium import webdriver
+from selenium.common.exceptions import (
+    NoAlertPresentException,
+    SessionNotCreatedException,
+    WebDriverException,
+)
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
+import perf
+import schedule
+from pages import LoginPage
+from seed import Seeder
 
-@pytest.fixture
-def base_url():
+
+# история прогонов (schedule.py); хуки ниже без доступа к config берут её отсюда
+history = None
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--changed-only", action="store_true", default=False,
+        help="пропустить тесты, у которых с последнего зелёного прогона ничего не поменялось",
+    )
+
+
+def default_base_url():
     # Порт подставь под свой, если менял launchSettings
     return os.getenv("TRP_BASE_URL", "https://localhost:7260")
 
 
-@pytest.fixture
+def pytest_configure(config):
+    global history
+    history = schedule.History(config.cache)
+    config.addinivalue_line(
+        "markers", "target_pages(*pages): страницы WebAppServer/Pages, которые проверяет тест"
+    )
+    # замеры страниц за прогон (perf.py); под xdist воркеры отдают свои контроллеру
+    config._trp_perf_samples = []
+    config._trp_perf_violations = []
+    # маркер pytest-xdist: тесты одной группы при --dist loadgroup идут в одном воркере
+    # подряд; регистрируем сами, чтобы без xdist не было предупреждений
+    config.addinivalue_line(
+        "markers", "xdist_group(name): тесты с общим изменяемым состоянием — в одном воркере"
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    # tryfirst: группы балансировки должны появиться до того, как xdist
+    # (--dist loadgroup) дописывает их к nodeid
+    base_url = default_base_url()
+    for item in items:
+        # nodeid под loadgroup получит суффикс @группа, ключ истории — исходный
+        item.user_properties.append(("trp_key", item.nodeid))
+        fp = schedule.fingerprint(item, base_url)
+        if fp:
+            item.user_properties.append(("trp_fingerprint", fp))
+
+    history.order(items)
+    if config.getoption("changed_only"):
+        skipped = history.skip_unchanged(items)
+        print(f"[INFO] --changed-only: без изменений с зелёного прогона {skipped} из {len(items)}")
+
+    workers = getattr(config, "workerinput", {}).get("workercount", 1)
+    if workers > 1 and config.getoption("dist", "no") == "loadgroup":
+        runnable = [i for i in items if i.get_closest_marker("skip") is None]
+        history.balance(runnable, workers)
+
+
+def pytest_runtest_logreport(report):
+    # под xdist отчёты воркеров приходят и в контроллер — он и запишет историю
+    history.add_report(report)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if hasattr(config, "workeroutput"):
+        # воркер xdist: замеры уезжают в контроллер (pytest_testnodedown ниже)
+        config.workeroutput["trp_perf"] = json.dumps(
+            [config._trp_perf_samples, config._trp_perf_violations]
+        )
+        return
+    history.save()
+    samples = config._trp_perf_samples
+    if not samples:
+        return
+    report = perf.build_report(samples)
+    perf.print_report(report)
+    path = os.getenv("TRP_PERF_REPORT") or os.path.join(perf.HERE, "perf_report.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"routes": report, "violations": config._trp_perf_violations, "samples": samples},
+            f, ensure_ascii=False, indent=2,
+        )
+    print(f"[PERF] отчёт: {path}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # хук pytest-xdist: воркер закончил, забираем его замеры
+    data = getattr(node, "workeroutput", {}).get("trp_perf")
+    if data:
+        samples, violations = json.loads(data)
+        node.config._trp_perf_samples.extend(samples)
+        node.config._trp_perf_violations.extend(violations)
+
+
+def worker_tag():
+    # gw0, gw1, ... под pytest-xdist; "m" при обычном последовательном запуске
+    return os.getenv("PYTEST_XDIST_WORKER", "m")
+
+
+@pytest.fixture(scope="session")
+def run_id():
+    # Метка прогона (секунды с начала эпохи в base36): БД общая между прогонами,
+    # так что одного номера воркера мало, нужен ещё и прогон
+    n = int(time.time())
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while n:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+    return out
+
+
+@pytest.fixture(scope="session")
+def unique_name(run_id):
+    """
+    Имена для создаваемых тестами логинов/курсов вместо uuid4().hex[:5]:
+    <префикс><воркер>_<прогон>_<номер>, например selenium_user_gw1_t9x2k1_3.
+    Не пересекаются между параллельными воркерами и между прогонами, а по имени
+    сразу видно, какой воркер и какой прогон оставил запись в БД.
+    """
+    counter = itertools.count(1)
+
+    def _unique_name(prefix: str) -> str:
+        return f"{prefix}{worker_tag()}_{run_id}_{next(counter)}"
+
+    return _unique_name
+
+
+@pytest.fixture(scope="session")
+def base_url():
+    return default_base_url()
+
+
+# Общие учётки одни на все воркеры: тесты их только читают (логинятся), каждый
+# браузер получает свою cookie-сессию, так что параллельные входы не мешают друг другу.
+# Тестам нельзя менять пароль/роль/блокировку этих учёток — для таких сценариев
+# создаётся свой пользователь через unique_name().
+@pytest.fixture(scope="session")
 def user_creds():
     # Должен существовать обычный пользователь в БД
     return (
@@ -24,7 +164,7 @@ def user_creds():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def admin_creds():
     # И админ с ролью Admin
     return (
@@ -33,20 +173,161 @@ def admin_creds():
     )
 
 
-@pytest.fixture
-def driver():
+CHROMEDRIVER_CACHE_KEY = "trp/chromedriver"
+
+
+def resolve_chromedriver(config, refresh=False):
+    """
+    Путь к chromedriver. ChromeDriverManager().install() каждый раз сверяет версию
+    (в т.ч. по сети) и пишет в общий кэш ~/.wdm, поэтому найденный путь запоминаем
+    в кэше pytest (.pytest_cache) и на следующих прогонах берём оттуда без сети.
+    TRP_CHROMEDRIVER — явный путь, ничего не ищем.
+    refresh=True — путь устарел (Chrome обновился), ищем заново.
+    """
+    explicit = os.getenv("TRP_CHROMEDRIVER")
+    if explicit:
+        return explicit
+    cached = None if refresh else config.cache.get(CHROMEDRIVER_CACHE_KEY, None)
+    if cached and os.path.exists(cached):
+        return cached
+    path = ChromeDriverManager().install()
+    config.cache.set(CHROMEDRIVER_CACHE_KEY, path)
+    return path
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    # хук pytest-xdist (optionalhook — без xdist pytest его просто не зовёт):
+    # вызывается в контроллере перед стартом каждого воркера, путь ищется один раз
+    if not hasattr(node.config, "_trp_chromedriver"):
+        node.config._trp_chromedriver = resolve_chromedriver(node.config)
+    node.workerinput["chromedriver"] = node.config._trp_chromedriver
+
+
+def new_chrome(driver_path):
     options = webdriver.ChromeOptions()
     # для дебага можешь закомментировать headless
     #options.add_argument("--headless=new")
     options.add_argument("--window-size=1920,1080")
 
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
+    # MeasuredChrome — тот же webdriver.Chrome, но замеряет каждый get() (perf.py)
+    driver = perf.MeasuredChrome(
+        service=Service(driver_path),
         options=options,
     )
-    driver.implicitly_wait(3)
+    # Неявное ожидание выключено: с ним каждая проверка "элемента нет"
+    # (find_elements, staleness) висит по 3 с, а явные ожидания из waits.py
+    # непредсказуемо складываются с неявным
+    driver.implicitly_wait(0)
+    return driver
+
+
+class BrowserPool:
+    """
+    Браузеры на всю сессию (под xdist — на воркер): запуск Chrome стоит секунды,
+    поэтому тест берёт уже запущенный браузер, а после теста его состояние
+    сбрасывается (cookies, storage, лишние вкладки, alert, about:blank).
+    Браузер, который не удалось сбросить (упал, завис), закрывается и
+    заменяется новым при следующем acquire().
+    """
+
+    def __init__(self, config):
+        self.config = config
+        workerinput = getattr(config, "workerinput", {})
+        self.driver_path = workerinput.get("chromedriver") or resolve_chromedriver(config)
+        self.idle = []
+        self.started = 0
+
+    def _start(self):
+        try:
+            driver = new_chrome(self.driver_path)
+        except SessionNotCreatedException:
+            # закэшированный chromedriver не подходит к обновившемуся Chrome
+            print("[INFO] chromedriver не подошёл к Chrome, ищем заново")
+            self.driver_path = resolve_chromedriver(self.config, refresh=True)
+            driver = new_chrome(self.driver_path)
+        self.started += 1
+        return driver
+
+    def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        return self._start()
+
+    def release(self, driver):
+        try:
+            reset_browser(driver)
+        except WebDriverException as e:
+            print(f"[INFO] браузер не сбросился ({e.__class__.__name__}), перезапуск")
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+            return
+        self.idle.append(driver)
+
+    def close(self):
+        while self.idle:
+            try:
+                self.idle.pop().quit()
+            except WebDriverException:
+                pass
+
+
+def reset_browser(driver):
+    # незакрытый alert блокирует любые команды
+    try:
+        driver.switch_to.alert.dismiss()
+    except NoAlertPresentException:
+        pass
+
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    # storage привязан к origin — чистим, пока ещё на странице приложения
+    if driver.current_url.startswith("http"):
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    # cookies всех доменов разом, не только текущей страницы
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    driver.get("about:blank")
+
+
+@pytest.fixture(scope="session")
+def browser_pool(request):
+    pool = BrowserPool(request.config)
+    yield pool
+    pool.close()
+    print(f"[INFO] запущено браузеров за сессию: {pool.started}")
+
+
+@pytest.fixture(scope="session")
+def perf_budgets():
+    return perf.load_budgets() if perf.enabled() else None
+
+
+@pytest.fixture
+def driver(request, browser_pool, perf_budgets):
+    driver = browser_pool.acquire()
+    collector = None
+    if perf_budgets is not None:
+        collector = perf.PerfCollector(perf_budgets, request.node.nodeid)
+        driver.perf = collector
     yield driver
-    driver.quit()
+    driver.perf = None
+    browser_pool.release(driver)
+
+    if collector is not None:
+        request.config._trp_perf_samples.extend(collector.samples)
+        request.config._trp_perf_violations.extend(
+            f"{request.node.nodeid}: {v}" for v in collector.violations
+        )
+        # страница отрисовалась, но медленнее бюджета — это тоже падение
+        if collector.violations and os.getenv("TRP_PERF_ENFORCE", "1") != "0":
+            pytest.fail("Превышены бюджеты страниц (perf_budgets.json):\n  "
+                        + "\n  ".join(collector.violations))
 
 
 @pytest.fixture
@@ -54,26 +335,94 @@ def wait(driver):
     return WebDriverWait(driver, 10)
 
 
-@pytest.fixture
-def login(driver, wait, base_url):
-    """Хелпер для логина через /Login"""
-    def _login(login_value: str, password_value: str):
-        driver.get(f"{base_url}/Login")
-        wait.until(EC.visibility_of_element_located((By.ID, "Login")))
+@pytest.fixture(scope="session")
+def auth_sessions():
+    # (логин, пароль) -> (cookies после входа, страница, куда редиректнул вход);
+    # на сессию/воркер, наполняется первым успешным входом через форму
+    return {}
+
 
-        login_input = driver.find_element(By.ID, "Login")
-        pass_input = driver.find_element(By.ID, "Password")
+def restore_auth(driver, base_url, saved):
+    # cookie ставим через CDP: так не нужно сначала открывать страницу сайта
+    cookies, landing_url = saved
+    for c in cookies:
+        params = {
+            "name": c["name"],
+            "value": c["value"],
+            "url": base_url,
+            "path": c.get("path", "/"),
+            "secure": c.get("secure", False),
+            "httpOnly": c.get("httpOnly", False),
+        }
+        if "expiry" in c:
+            params["expires"] = c["expiry"]
+        if "sameSite" in c:
+            params["sameSite"] = c["sameSite"]
+        driver.execute_cdp_cmd("Network.setCookie", params)
+    driver.get(landing_url)
+    # cookie протухла (перезапуск сервера с новыми ключами и т.п.) — нас вернуло на /Login
+    return "/Login" not in driver.current_url
 
-        login_input.clear()
-        login_input.send_keys(login_value)
 
-        pass_input.clear()
-        pass_input.send_keys(password_value)
-        sleep(1)
+@pytest.fixture
+def login(driver, wait, base_url, auth_sessions):
+    """
+    Хелпер для логина через /Login.
+    Форма проходится один раз на учётку за сессию; дальше в браузер подставляются
+    сохранённые cookies и открывается та же страница, куда редиректнул вход,
+    т.е. после login() тест оказывается там же, где и после формы.
+    fresh=True — всегда через форму (для тестов самого входа).
+    """
+    def _login(login_value: str, password_value: str, fresh: bool = False):
+        key = (login_value, password_value)
+        if not fresh and key in auth_sessions:
+            if restore_auth(driver, base_url, auth_sessions[key]):
+                print("logined (cookie)")
+                return
+            del auth_sessions[key]
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
 
-        driver.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
+        page = LoginPage(driver, wait, base_url).open()
+        # возврат — когда сервер ответил на POST (редирект или та же /Login с ошибкой)
+        page.log_in(login_value, password_value)
         print("logined")
-        sleep(1)
+
+        # неверный логин оставляет на /Login — такое не запоминаем
+        if not page.still_here():
+            auth_sessions[key] = (driver.get_cookies(), driver.current_url)
 
     return _login
 
+
+@pytest.fixture(scope="session")
+def seeder(base_url, admin_creds):
+    """
+    Данные для тестов через HTTP (см. seed.py); всё созданное за сессию
+    (под xdist — за воркер) удаляется одной пачкой в конце.
+    """
+    seeder = Seeder(base_url, admin_creds)
+    yield seeder
+    seeder.cleanup()
+
+
+@pytest.fixture
+def seeded_user(seeder, unique_name):
+    # свежий пользователь на тест — для сценариев, которые его меняют/удаляют
+    return seeder.user(unique_name("selenium_seed_"))
+
+
+@pytest.fixture(scope="session")
+def seeded_course(seeder, unique_name, user_creds):
+    """
+    Курс с одним заданием, где обычный пользователь из user_creds — участник:
+    у него курс появляется в "Я участник" со ссылкой на /Courses/Details.
+    Автор — отдельный пользователь из сидинга (хардкоженный admin не в БД
+    и курсы создавать не может).
+    """
+    author = seeder.user(unique_name("selenium_author_"), name="Selenium Course Author")
+    return seeder.course(
+        author,
+        unique_name("SeededCourse_"),
+        tasks=[unique_name("SeededTask_")],
+        participants=[user_creds[0]],
+    )
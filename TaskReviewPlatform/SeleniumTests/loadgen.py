@@ -0,0 +1,261 @@
+"""
+Нагрузочный прогон TaskReviewPlatform на asyncio: те же сценарии, что в
+UI-тестах (вход, список курсов, курс, задание, ответ), но на уровне HTTP и
+сразу от N виртуальных пользователей.
+
+    python loadgen.py --users 20 --duration 60
+    python loadgen.py --users 50 --ramp 10 --write --json load.json
+
+Каждый виртуальный пользователь — отдельная учётка из сидинга (seed.py) со
+своими cookies; соединения keep-alive из общего пула (aiohttp.TCPConnector).
+Итог — p50/p95/p99 и запросы в секунду по каждому эндпоинту.
+Запускается только против локально поднятого сервера (localhost).
+
+Нужен aiohttp: pip install aiohttp
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import ssl
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from seed import Seeder, find_token, tls_verify
+
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+USER_PASSWORD = "LoadPass123!"
+
+_DETAILS_RE = re.compile(r'href="/Courses/Details/(\d+)"')
+_ANSWERS_RE = re.compile(r'href="/Tasks/Answers/(\d+)"')
+
+
+class Stats:
+    """Задержки (мс) и ошибки по эндпоинтам вида "GET /Courses"."""
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint, ms, ok):
+        if ok:
+            self.latency[endpoint].append(ms)
+        else:
+            self.errors[endpoint] += 1
+
+    def rows(self, wall):
+        rows = []
+        for endpoint in sorted(set(self.latency) | set(self.errors)):
+            values = sorted(self.latency[endpoint])
+            rows.append({
+                "endpoint": endpoint,
+                "count": len(values),
+                "errors": self.errors[endpoint],
+                "rps": round(len(values) / wall, 2) if wall else 0.0,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": round(values[-1], 1) if values else None,
+            })
+        return rows
+
+
+def percentile(values, p):
+    # nearest-rank по отсортированному списку
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, -(-len(values) * p // 100) - 1))
+    return round(values[int(k)], 1)
+
+
+class VirtualUser:
+    """
+    Один пользователь: логинится, затем по кругу повторяет сценарий
+    /Courses -> /Courses/Details/{id} -> /Tasks/Answers/{id}
+    (+ создание курса и ответа с --write).
+    """
+
+    def __init__(self, aiohttp, connector, base_url, creds, stats, args, seeder):
+        self.aiohttp = aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.login, self.password = creds
+        self.stats = stats
+        self.args = args
+        self.seeder = seeder
+        self.token = None
+        self.seq = 0
+        # свой cookie jar, общий пул соединений
+        self.http = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=args.timeout),
+        )
+
+    async def request(self, method, endpoint, path, expect, **kwargs):
+        """Запрос с замером; тело дочитывается целиком, редиректы не идём."""
+        started = time.perf_counter()
+        try:
+            async with self.http.request(
+                method, f"{self.base_url}{path}", allow_redirects=False, **kwargs
+            ) as r:
+                body = await r.text()
+                ok = r.status == expect
+        except (self.aiohttp.ClientError, asyncio.TimeoutError):
+            body, ok = "", False
+        self.stats.add(endpoint, (time.perf_counter() - started) * 1000, ok)
+        if ok and self.token is None:
+            self.token = find_token(body)
+        return body if ok else None
+
+    async def sign_in(self):
+        await self.request("GET", "GET /Login", "/Login", 200)
+        body = await self.request(
+            "POST", "POST /Login", "/Login", 302,
+            data={"Login": self.login, "Password": self.password,
+                  "__RequestVerificationToken": self.token or ""},
+        )
+        # токен анонима после входа не годится
+        self.token = None
+        return body is not None
+
+    async def iteration(self):
+        courses = await self.request("GET", "GET /Courses", "/Courses", 200)
+        if courses is None:
+            return
+
+        if self.args.write:
+            self.seq += 1
+            name = f"LoadCourse_{self.login}_{self.seq}"
+            sent = await self.request(
+                "POST", "POST /Courses", "/Courses?handler=Create", 302,
+                data={"NewCourseName": name, "NewCourseDescription": "Курс нагрузочного прогона.",
+                      "__RequestVerificationToken": self.token or ""},
+            )
+            if sent is not None:
+                self.seeder.track_course(self.login, self.password, name)
+
+        for course_id in _DETAILS_RE.findall(courses)[:1]:
+            details = await self.request(
+                "GET", "GET /Courses/Details", f"/Courses/Details/{course_id}", 200
+            )
+            if details is None:
+                return
+            for task_id in _ANSWERS_RE.findall(details)[:1]:
+                path = f"/Tasks/Answers/{task_id}"
+                if await self.request("GET", "GET /Tasks/Answers", path, 200) is None:
+                    return
+                if self.args.write:
+                    form = self.aiohttp.FormData()
+                    form.add_field("NewAnswerText", f"Ответ нагрузочного прогона {self.login} #{self.seq}")
+                    form.add_field("__RequestVerificationToken", self.token or "")
+                    await self.request("POST", "POST /Tasks/Answers", f"{path}?handler=Create", 302, data=form)
+
+    async def run(self, start_delay, deadline):
+        await asyncio.sleep(start_delay)
+        try:
+            if not await self.sign_in():
+                print(f"[WARN] {self.login}: вход не удался, пользователь выбывает")
+                return
+            while time.monotonic() < deadline:
+                await self.iteration()
+                if self.args.think:
+                    await asyncio.sleep(self.args.think / 1000)
+        finally:
+            await self.http.close()
+
+
+async def run_load(aiohttp, base_url, users, args, seeder):
+    # TRP_TLS_VERIFY (seed.tls_verify): False, True или путь к CA-бандлу
+    verify = seeder.verify
+    if isinstance(verify, str):
+        verify = ssl.create_default_context(cafile=verify)
+    connector = aiohttp.TCPConnector(limit=args.connections, ssl=verify, keepalive_timeout=30)
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.ramp + args.duration
+    vus = [VirtualUser(aiohttp, connector, base_url, creds, stats, args, seeder) for creds in users]
+    # равномерный разгон: i-й пользователь стартует через ramp * i / N секунд
+    step = args.ramp / len(vus) if vus else 0
+    try:
+        await asyncio.gather(*(vu.run(i * step, deadline) for i, vu in enumerate(vus)))
+    finally:
+        await connector.close()
+    return stats, time.monotonic() - started
+
+
+def ensure_local(base_url):
+    host = urlsplit(base_url).hostname
+    if host not in LOCAL_HOSTS:
+        raise SystemExit(
+            f"Нагрузка пускается только на локальный сервер, а TRP_BASE_URL указывает на {host!r}"
+        )
+
+
+def print_report(rows, wall, users):
+    print(f"\nВиртуальных пользователей: {users}, длительность: {wall:.1f} с\n")
+    header = f"{'Эндпоинт':<24}{'запросов':>9}{'ошибок':>8}{'RPS':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        cells = [r["p50"], r["p95"], r["p99"], r["max"]]
+        ms = "".join(f"{'-' if v is None else v:>9}" for v in cells)
+        print(f"{r['endpoint']:<24}{r['count']:>9}{r['errors']:>8}{r['rps']:>8}{ms}")
+    print("\nзадержки в мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон TaskReviewPlatform (asyncio)")
+    parser.add_argument("--base-url", default=os.getenv("TRP_BASE_URL", "https://localhost:7260"))
+    parser.add_argument("--users", type=int, default=10, help="виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="секунд после разгона")
+    parser.add_argument("--ramp", type=float, default=5, help="секунд на разгон до --users")
+    parser.add_argument("--think", type=float, default=0, help="пауза между итерациями, мс")
+    parser.add_argument("--connections", type=int, default=100, help="размер общего пула соединений")
+    parser.add_argument("--timeout", type=float, default=30, help="таймаут одного запроса, с")
+    parser.add_argument("--write", action="store_true",
+                        help="ещё и создавать курсы и ответы (всё удаляется после прогона)")
+    parser.add_argument("--json", help="сохранить итоговую таблицу в JSON")
+    args = parser.parse_args()
+
+    ensure_local(args.base_url)
+    try:
+        import aiohttp
+    except ImportError:
+        raise SystemExit("Для нагрузочного прогона нужен aiohttp (pip install aiohttp)")
+
+    admin = (os.getenv("TRP_ADMIN_LOGIN", "admin"), os.getenv("TRP_ADMIN_PASSWORD", "admin"))
+    seeder = Seeder(args.base_url, admin, tls_verify())
+    run_tag = f"{int(time.time()):x}"
+    try:
+        # учётки и курс с заданием, где все виртуальные пользователи — участники
+        print(f"[INFO] сидинг: {args.users} пользователей и курс с заданием...")
+        users = []
+        for i in range(args.users):
+            u = seeder.user(f"load_{run_tag}_{i}", USER_PASSWORD, "Load Test User")
+            users.append((u.login, u.password))
+        author = seeder.user(f"load_{run_tag}_author", USER_PASSWORD, "Load Test Author")
+        seeder.course(author, f"LoadCourse_{run_tag}", tasks=[f"LoadTask_{run_tag}"],
+                      participants=[login for login, _ in users])
+
+        print(f"[INFO] нагрузка на {args.base_url}: разгон {args.ramp} с, затем {args.duration} с")
+        stats, wall = asyncio.run(run_load(aiohttp, args.base_url, users, args, seeder))
+    finally:
+        seeder.cleanup()
+
+    rows = stats.rows(wall)
+    print_report(rows, wall, args.users)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, "wall": round(wall, 2), "endpoints": rows},
+                      f, ensure_ascii=False, indent=2)
+        print(f"[INFO] таблица сохранена в {args.json}")
+    sys.exit(1 if any(r["errors"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
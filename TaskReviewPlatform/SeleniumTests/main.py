@@ -1,7 +1,26 @@
+import importlib.util
+import os
 import sys
 import pytest
 
 
+def xdist_args():
+    """
+    Аргументы параллельного запуска через pytest-xdist (pip install pytest-xdist).
+    Каждый воркер — отдельный процесс со своим браузером и своими данными из
+    сидинга; тесты с общим изменяемым состоянием можно пометить xdist_group,
+    тогда они идут в одном воркере.
+    TRP_WORKERS: число воркеров или "auto" (по ядрам), "0" — последовательно.
+    """
+    workers = os.getenv("TRP_WORKERS", "auto")
+    if workers == "0":
+        return []
+    if importlib.util.find_spec("xdist") is None:
+        print("[INFO] pytest-xdist не установлен — тесты идут последовательно")
+        return []
+    return ["-n", workers, "--dist", "loadgroup"]
+
+
 def main():
     """
     Точка входа для запуска всех UI-тестов.
@@ -9,7 +28,13 @@ def main():
     """
     # -v            = подробный вывод
     # --maxfail=1   = остановиться после первого упавшего теста (можно убрать)
-    args = ["-v", "--maxfail=2", "."]
+    # -n N          = N воркеров pytest-xdist (см. xdist_args)
+    # Порядок берётся из истории прогонов (schedule.py): упавшие в прошлый раз
+    # первыми, так что --maxfail быстро показывает, починилось ли.
+    # TRP_CHANGED_ONLY=1 = только тесты, у которых что-то поменялось с зелёного прогона
+    args = ["-v", "--maxfail=2", *xdist_args(), "."]
+    if os.getenv("TRP_CHANGED_ONLY") == "1":
+        args.insert(-1, "--changed-only")
 
     # pytest.main возвращает код выхода (0 если всё ок)
     result_code = pytest.main(args)
@@ -0,0 +1,162 @@
+"""
+Page objects для страниц, которые трогают UI-тесты: /Login, /Admin/Users,
+/Courses (+ /Courses/Details) и /Tasks/Answers.
+Локаторы и ожидания живут здесь, тесты описывают только сценарий.
+"""
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+from waits import clickable, gone, page_update, row_with_cell, text_in, visible, xpath_literal
+
+
+class BasePage:
+    path = "/"
+    # заголовок, по которому понятно, что страница отрисовалась
+    heading = None
+
+    def __init__(self, driver, wait, base_url):
+        self.driver = driver
+        self.wait = wait
+        self.base_url = base_url
+
+    def open(self, suffix=""):
+        # suffix — хвост маршрута, например "/15" для /Courses/Details/{id}
+        self.driver.get(f"{self.base_url}{self.path}{suffix}")
+        self.loaded()
+        return self
+
+    def loaded(self):
+        if self.heading:
+            text_in(self.wait, self.heading[0], self.heading[1])
+        return self
+
+    def fill(self, locator, value):
+        field = self.driver.find_element(*locator)
+        field.clear()
+        field.send_keys(value)
+        return field
+
+    def submit_form_of(self, field):
+        # форма, в которой лежит поле; ждём ответ сервера, а не sleep()
+        form = field.find_element(By.XPATH, "./ancestor::form")
+        submit = form.find_element(By.CSS_SELECTOR, "button[type='submit']")
+        with page_update(self.driver, self.wait):
+            submit.click()
+
+
+class LoginPage(BasePage):
+    path = "/Login"
+    heading = ((By.TAG_NAME, "h2"), "Вход")
+
+    LOGIN = (By.ID, "Login")
+    PASSWORD = (By.ID, "Password")
+
+    def log_in(self, login_value, password_value):
+        visible(self.wait, self.LOGIN)
+        self.fill(self.LOGIN, login_value)
+        field = self.fill(self.PASSWORD, password_value)
+        self.submit_form_of(field)
+
+    def still_here(self):
+        # неверный логин: сервер отдаёт ту же страницу /Login
+        return "/Login" in self.driver.current_url
+
+
+class AdminUsersPage(BasePage):
+    path = "/Admin/Users"
+    heading = ((By.TAG_NAME, "h2"), "Список пользователей")
+
+    # Для asp-for="InputUser.Login" Razor сгенерит id="InputUser_Login"
+    LOGIN = (By.ID, "InputUser_Login")
+    NAME = (By.ID, "InputUser_Name")
+    PASSWORD = (By.ID, "InputUser_Password")
+
+    def create_user(self, login_value, name, password):
+        visible(self.wait, self.LOGIN)
+        field = self.fill(self.LOGIN, login_value)
+        self.fill(self.NAME, name)
+        self.fill(self.PASSWORD, password)
+        self.submit_form_of(field)
+
+    def user_row(self, login_value):
+        return self.wait.until(EC.presence_of_element_located(row_with_cell(login_value)))
+
+    def has_user(self, login_value):
+        return bool(self.driver.find_elements(*row_with_cell(login_value)))
+
+    def wait_user_gone(self, login_value):
+        gone(self.wait, row_with_cell(login_value))
+
+    def row_button(self, login_value, caption):
+        return self.user_row(login_value).find_element(
+            By.XPATH, f".//button[normalize-space()={xpath_literal(caption)}]"
+        )
+
+
+class CoursesPage(BasePage):
+    path = "/Courses"
+    heading = ((By.TAG_NAME, "h2"), "Мои курсы")
+
+    NAME = (By.ID, "NewCourseName")
+    DESCRIPTION = (By.ID, "NewCourseDescription")
+
+    def create_course(self, name, description):
+        field = visible(self.wait, self.NAME)
+        self.fill(self.NAME, name)
+        self.fill(self.DESCRIPTION, description)
+        self.submit_form_of(field)
+
+    @staticmethod
+    def course_title(name):
+        # <a><b>Название</b>...</a> в списках "Я автор"/"Я участник"
+        return (By.XPATH, f"//li//a/b[normalize-space()={xpath_literal(name)}]")
+
+    def wait_course_listed(self, name):
+        return self.wait.until(EC.presence_of_element_located(self.course_title(name)))
+
+    def open_course(self, name):
+        # курс из списка "Я участник" (ссылка на /Courses/Details/{id})
+        link = clickable(self.wait, (
+            By.XPATH,
+            f"//a[contains(@href,'/Courses/Details')][b[normalize-space()={xpath_literal(name)}]]",
+        ))
+        with page_update(self.driver, self.wait):
+            link.click()
+        self.wait.until(EC.url_contains("/Courses/Details"))
+        return CourseDetailsPage(self.driver, self.wait, self.base_url)
+
+
+class CourseDetailsPage(BasePage):
+    path = "/Courses/Details"
+
+    TASK_LINK = (By.CSS_SELECTOR, "a[href*='/Tasks/Answers']")
+
+    def has_text(self, text):
+        # текст в body без сериализации всего DOM через page_source
+        return text in self.driver.find_element(By.TAG_NAME, "body").text
+
+    def open_first_task(self):
+        link = clickable(self.wait, self.TASK_LINK)
+        with page_update(self.driver, self.wait):
+            link.click()
+        self.wait.until(EC.url_contains("/Tasks/Answers"))
+        return TaskAnswersPage(self.driver, self.wait, self.base_url)
+
+
+class TaskAnswersPage(BasePage):
+    path = "/Tasks/Answers"
+
+    NEW_ANSWER = (By.ID, "NewAnswerText")
+
+    def submit_answer(self, text):
+        field = visible(self.wait, self.NEW_ANSWER)
+        self.fill(self.NEW_ANSWER, text)
+        self.submit_form_of(field)
+
+    @staticmethod
+    def answer_text(text):
+        # текст ответа в карточке: <p class="mb-2">@a.Text</p>
+        return (By.XPATH, f"//div[contains(@class,'answer-card')]//p[normalize-space()={xpath_literal(text)}]")
+
+    def wait_answer_listed(self, text):
+        return self.wait.until(EC.presence_of_element_located(self.answer_text(text)))
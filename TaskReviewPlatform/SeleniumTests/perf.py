@@ -0,0 +1,176 @@
+"""
+Метрики производительности страниц в UI-тестах.
+
+После каждого driver.get (MeasuredChrome ниже) через Chrome DevTools Protocol
+снимаются Navigation Timing, Paint Timing, число и объём загруженных ресурсов
+и счётчики Performance.getMetrics. Каждое значение сверяется с бюджетом
+маршрута из perf_budgets.json; превышение роняет тест, даже если на странице
+всё нужное есть. В конце прогона пишется отчёт по маршрутам (perf_report.json).
+
+TRP_PERF=0            — ничего не замерять
+TRP_PERF_ENFORCE=0    — замерять и писать отчёт, но бюджеты не проверять
+TRP_PERF_BUDGETS      — другой файл бюджетов
+TRP_PERF_REPORT       — куда писать отчёт
+"""
+import json
+import os
+import re
+import statistics
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Всё в мс, кроме resources (штук) и transfer_kb
+_TIMING_JS = """
+(() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  if (!nav || nav.loadEventEnd <= 0) return null;
+  const paint = {};
+  for (const p of performance.getEntriesByType('paint')) paint[p.name] = p.startTime;
+  const res = performance.getEntriesByType('resource');
+  let transfer = nav.transferSize || 0;
+  for (const r of res) transfer += r.transferSize || 0;
+  return {
+    ttfb: nav.responseStart - nav.startTime,
+    dcl: nav.domContentLoadedEventEnd - nav.startTime,
+    load: nav.loadEventEnd - nav.startTime,
+    fp: paint['first-paint'] ?? null,
+    fcp: paint['first-contentful-paint'] ?? null,
+    resources: res.length,
+    transfer_kb: transfer / 1024,
+  };
+})()
+"""
+
+# loadEventEnd проставляется после обработчиков onload, уже после возврата
+# driver.get(); столько ждём его, прежде чем снимать замер
+_LOADED_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+return !!nav && nav.loadEventEnd > 0;
+"""
+LOAD_WAIT = 5
+
+# из Performance.getMetrics — для отчёта, бюджетов на них нет
+CDP_METRICS = ("Nodes", "LayoutCount", "ScriptDuration", "JSHeapUsedSize")
+
+_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def enabled():
+    return os.getenv("TRP_PERF", "1") != "0"
+
+
+def route_of(url):
+    # /Courses/Details/15?x=1 -> /Courses/Details/{id}
+    path = urlsplit(url).path.rstrip("/") or "/"
+    return _ID_RE.sub("/{id}", path)
+
+
+def load_budgets(path=None):
+    path = path or os.getenv("TRP_PERF_BUDGETS") or os.path.join(HERE, "perf_budgets.json")
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("default", {}), data.get("routes", {})
+
+
+class PerfCollector:
+    """
+    Замеры одного теста. Одна метрика на каждый driver.get; violations —
+    превышения бюджетов в виде строк для сообщения об ошибке.
+    """
+
+    def __init__(self, budgets, test_id):
+        self.default, self.routes = budgets
+        self.test_id = test_id
+        self.samples = []
+        self.violations = []
+
+    def budget_for(self, route):
+        return {**self.default, **self.routes.get(route, {})}
+
+    def record(self, driver, url):
+        if not url.startswith("http"):
+            return
+        try:
+            WebDriverWait(driver, LOAD_WAIT, poll_frequency=0.05).until(
+                lambda d: d.execute_script(_LOADED_JS)
+            )
+        except TimeoutException:
+            # с load = 0 замер занизил бы метрику и не поймал превышение бюджета
+            print(f"[WARN] perf: {url} не дождался loadEventEnd за {LOAD_WAIT} с, замер пропущен")
+            return
+        except WebDriverException as e:
+            print(f"[WARN] perf: не удалось снять метрики {url}: {e.__class__.__name__}")
+            return
+        try:
+            timing = driver.execute_cdp_cmd(
+                "Runtime.evaluate", {"expression": _TIMING_JS, "returnByValue": True}
+            )["result"].get("value")
+            metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+        except WebDriverException as e:
+            print(f"[WARN] perf: не удалось снять метрики {url}: {e.__class__.__name__}")
+            return
+        if not timing:
+            return
+        cdp = {m["name"]: m["value"] for m in metrics if m["name"] in CDP_METRICS}
+        route = route_of(url)
+        sample = {"test": self.test_id, "route": route, "url": url,
+                  **{k: round(v, 1) for k, v in timing.items() if v is not None},
+                  **{k: round(v, 1) for k, v in cdp.items()}}
+        self.samples.append(sample)
+
+        for metric, limit in self.budget_for(route).items():
+            value = sample.get(metric)
+            if value is not None and value > limit:
+                self.violations.append(f"{route}: {metric} = {value} > {limit}")
+
+
+class MeasuredChrome(webdriver.Chrome):
+    """
+    Chrome, который после каждого get() отдаёт страницу на замер текущему
+    PerfCollector (его ставит фикстура driver на время теста).
+    """
+
+    perf = None
+
+    def start_session(self, *args, **kwargs):
+        super().start_session(*args, **kwargs)
+        # счётчики Performance.getMetrics включаются один раз на браузер
+        self.execute_cdp_cmd("Performance.enable", {})
+
+    def get(self, url):
+        super().get(url)
+        if self.perf is not None:
+            self.perf.record(self, url)
+
+
+def build_report(samples):
+    """Сводка по маршрутам: сколько раз открывали, медиана и максимум метрик."""
+    by_route = {}
+    for s in samples:
+        by_route.setdefault(s["route"], []).append(s)
+    report = {}
+    for route, items in sorted(by_route.items()):
+        row = {"count": len(items)}
+        for metric in ("ttfb", "dcl", "load", "fcp", "resources", "transfer_kb"):
+            values = [s[metric] for s in items if metric in s]
+            if values:
+                row[f"{metric}_median"] = round(statistics.median(values), 1)
+                row[f"{metric}_max"] = round(max(values), 1)
+        report[route] = row
+    return report
+
+
+def print_report(report):
+    print("\n[PERF] маршрут: открытий, load медиана/макс (мс), FCP медиана (мс), ресурсов")
+    for route, row in report.items():
+        print(
+            f"[PERF] {route}: {row['count']}, "
+            f"{row.get('load_median', '-')}/{row.get('load_max', '-')}, "
+            f"{row.get('fcp_median', '-')}, {row.get('resources_max', '-')}"
+        )
@@ -0,0 +1,171 @@
+"""
+Порядок и отбор UI-тестов по истории прогонов.
+
+В кэше pytest (.pytest_cache, ключ trp/results) для каждого теста хранится
+длительность, исход последнего прогона и отпечаток исходников, от которых он
+зависит. По этой истории:
+  - упавшие в прошлый раз идут первыми, затем новые, затем от долгих к коротким;
+  - под xdist тесты раскладываются по воркерам так, чтобы суммарная длительность
+    у всех была примерно одинаковой (группы xdist_group + --dist loadgroup);
+  - с --changed-only пропускаются тесты, у которых с последнего зелёного прогона
+    не изменились ни сам тест, ни общие модули/фикстуры, ни целевые страницы
+    (маркер target_pages), ни адрес сервера.
+"""
+import hashlib
+import os
+import time
+
+import pytest
+
+
+CACHE_KEY = "trp/results"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.dirname(HERE)
+
+# от этих файлов зависят все тесты: фикстуры, page objects, сидинг, бюджеты
+SUPPORT_FILES = ("conftest.py", "pages.py", "waits.py", "seed.py", "perf.py", "perf_budgets.json")
+# общее для всех страниц приложения: разметка, сервисы, модели, работа с БД
+APP_SHARED = (
+    "WebAppServer/Program.cs",
+    "WebAppServer/Pages/Shared",
+    "WebAppServer/Pages/_ViewImports.cshtml",
+    "WebAppServer/Pages/_ViewStart.cshtml",
+    "WebAppServer/Services",
+    "Models",
+    "Repository",
+)
+SOURCE_SUFFIXES = (".cs", ".cshtml", ".py", ".json")
+
+# длительность теста без истории, пока нечего усреднять
+DEFAULT_DURATION = 5.0
+
+_digests = {}
+
+
+def path_digest(path):
+    """sha1 файла или всех исходников каталога; отсутствующий путь тоже учитывается."""
+    if path in _digests:
+        return _digests[path]
+    h = hashlib.sha1()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in ("bin", "obj"))
+            for name in sorted(files):
+                if name.endswith(SOURCE_SUFFIXES):
+                    full = os.path.join(root, name)
+                    h.update(os.path.relpath(full, path).encode())
+                    with open(full, "rb") as f:
+                        h.update(f.read())
+    elif os.path.exists(path):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    else:
+        h.update(b"missing")
+    _digests[path] = h.hexdigest()
+    return _digests[path]
+
+
+def fingerprint(item, base_url):
+    """
+    Отпечаток всего, от чего зависит тест. None — тест не объявил целевые
+    страницы (@pytest.mark.target_pages) и пропускать его нельзя.
+    """
+    mark = item.get_closest_marker("target_pages")
+    if mark is None:
+        return None
+    paths = [str(item.path)]
+    paths += [os.path.join(HERE, name) for name in SUPPORT_FILES]
+    paths += [os.path.join(APP, p) for p in APP_SHARED]
+    for page in mark.args:
+        base = os.path.join(APP, "WebAppServer", "Pages", page)
+        paths += [base + ".cshtml", base + ".cshtml.cs"]
+    h = hashlib.sha1(base_url.encode())
+    for p in paths:
+        h.update(path_digest(p).encode())
+    return h.hexdigest()
+
+
+class History:
+    """
+    История прогонов в кэше pytest. Пишет только процесс, который видит все
+    отчёты: обычный запуск или контроллер xdist (воркеры кэш только читают).
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.results = cache.get(CACHE_KEY, {})
+        # текущий прогон: key -> {"duration", "failed", "fingerprint"}
+        self.current = {}
+
+    def duration(self, key):
+        r = self.results.get(key)
+        return r["duration"] if r else DEFAULT_DURATION
+
+    def order(self, items):
+        """Упавшие в прошлый раз, потом новые, потом по убыванию длительности."""
+        def rank(item):
+            r = self.results.get(item.nodeid)
+            if r is None:
+                return (1, 0.0)
+            return (0 if r["outcome"] == "failed" else 2, -r["duration"])
+
+        items.sort(key=rank)
+
+    def balance(self, items, workers):
+        """
+        Жадная раскладка (LPT): самый долгий из оставшихся тестов — воркеру с
+        наименьшей суммарной длительностью. Каждый воркер получает свою группу
+        xdist_group; тесты с явной группой не трогаем.
+        """
+        loads = [0.0] * workers
+        free = [i for i in items if i.get_closest_marker("xdist_group") is None]
+        for item in sorted(free, key=lambda i: -self.duration(i.nodeid)):
+            n = loads.index(min(loads))
+            loads[n] += self.duration(item.nodeid)
+            item.add_marker(pytest.mark.xdist_group(f"balance{n}"))
+        return loads
+
+    def skip_unchanged(self, items):
+        skipped = 0
+        for item in items:
+            fp = dict(item.user_properties).get("trp_fingerprint")
+            r = self.results.get(item.nodeid)
+            if fp and r and r.get("green_fingerprint") == fp:
+                when = time.strftime("%d.%m %H:%M", time.localtime(r["green_at"]))
+                item.add_marker(pytest.mark.skip(
+                    reason=f"не менялся с зелёного прогона {when} (--changed-only)"
+                ))
+                skipped += 1
+        return skipped
+
+    def add_report(self, report):
+        props = dict(report.user_properties)
+        key = props.get("trp_key")
+        if key is None:
+            return
+        entry = self.current.setdefault(
+            key, {"duration": 0.0, "failed": False, "skipped": False,
+                  "fingerprint": props.get("trp_fingerprint")}
+        )
+        entry["duration"] += report.duration
+        if report.failed:
+            entry["failed"] = True
+        if report.skipped and report.when in ("setup", "call"):
+            entry["skipped"] = True
+
+    def save(self):
+        now = time.time()
+        for key, entry in self.current.items():
+            # пропущенный тест не прогонялся — старая история остаётся как была
+            if entry["skipped"] and not entry["failed"]:
+                continue
+            r = self.results.setdefault(key, {})
+            r["duration"] = round(entry["duration"], 3)
+            r["outcome"] = "failed" if entry["failed"] else "passed"
+            if entry["failed"]:
+                r.pop("green_fingerprint", None)
+            elif entry["fingerprint"]:
+                r["green_fingerprint"] = entry["fingerprint"]
+                r["green_at"] = now
+        self.cache.set(CACHE_KEY, self.results)
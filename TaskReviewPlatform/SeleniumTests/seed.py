@@ -0,0 +1,279 @@
+"""
+Подготовка тестовых данных напрямую по HTTP, без браузера.
+
+Пользователи, курсы и задания создаются теми же POST-запросами, что шлют формы
+Razor Pages (/Admin/Users, /Courses, /Courses/Edit/{id}), поэтому серверу всё
+равно, кто их отправил. Один запрос вместо открытия страницы, заполнения полей
+и ожидания редиректа в Chrome — миллисекунды вместо секунд, и тестам не нужны
+заранее заведённые в БД курсы с заданиями.
+
+Всё созданное запоминается в Seeder и удаляется пачкой в конце сессии
+(Seeder.cleanup): одна выборка /Admin/Users на всех пользователей, один логин
+на каждого автора курсов.
+"""
+import html
+import os
+import re
+from collections import namedtuple
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+
+SeededUser = namedtuple("SeededUser", "login password name")
+SeededCourse = namedtuple("SeededCourse", "id name author task_ids")
+
+TOKEN_FIELD = "__RequestVerificationToken"
+
+# таймаут одного запроса, с (TRP_HTTP_TIMEOUT): без него зависший сервер
+# подвешивает сидинг, а в конце сессии — и уборку
+HTTP_TIMEOUT = float(os.getenv("TRP_HTTP_TIMEOUT", "30"))
+
+_INPUT_RE = re.compile(r"<input\b[^>]*>", re.I)
+_VALUE_RE = re.compile(r'\bvalue="([^"]*)"')
+# строка таблицы /Admin/Users: <tr><td>Id</td><td>Login</td>...
+_USER_ROW_RE = re.compile(r"<tr>\s*<td>(\d+)</td>\s*<td>([^<]*)</td>")
+
+
+class SeedError(Exception):
+    pass
+
+
+def tls_verify():
+    """
+    TRP_TLS_VERIFY: путь к CA-бандлу, "1" — обычная проверка.
+    По умолчанию выключено: локальный dev-сертификат ASP.NET не в certifi.
+    """
+    value = os.getenv("TRP_TLS_VERIFY", "0")
+    if value == "0":
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        return False
+    return True if value == "1" else value
+
+
+def find_token(page):
+    # <input name="__RequestVerificationToken" type="hidden" value="..." />
+    for tag in _INPUT_RE.findall(page):
+        if f'name="{TOKEN_FIELD}"' in tag:
+            m = _VALUE_RE.search(tag)
+            if m:
+                return html.unescape(m.group(1))
+    return None
+
+
+class HttpSession:
+    """
+    requests.Session с keep-alive пулом соединений и своим набором cookies
+    (одна учётка — одна сессия).
+    Antiforgery-токен берётся из первой же формы и переиспользуется для всех POST,
+    пока не сменится пользователь: токен привязан к cookie и к логину.
+    """
+
+    def __init__(self, base_url, verify):
+        self.base_url = base_url.rstrip("/")
+        self.http = requests.Session()
+        self.http.verify = verify
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.token = None
+        self.login = None
+
+    def get(self, path):
+        r = self.http.get(f"{self.base_url}{path}", allow_redirects=False, timeout=HTTP_TIMEOUT)
+        if r.status_code != 200:
+            raise SeedError(f"GET {path}: HTTP {r.status_code}")
+        if self.token is None:
+            self.token = find_token(r.text)
+        return r.text
+
+    def post(self, path, data, token_page):
+        """
+        POST формы. Удачный handler в этом приложении всегда отвечает
+        редиректом (PRG); 200 — форма вернулась с ошибкой валидации,
+        400 — не принят antiforgery-токен.
+        """
+        if self.token is None:
+            self.get(token_page)
+        if self.token is None:
+            raise SeedError(f"на {token_page} нет {TOKEN_FIELD}")
+        r = self.http.post(
+            f"{self.base_url}{path}",
+            data={**data, TOKEN_FIELD: self.token},
+            allow_redirects=False,
+            timeout=HTTP_TIMEOUT,
+        )
+        if r.status_code not in (301, 302, 303):
+            raise SeedError(f"POST {path}: HTTP {r.status_code}")
+        return r.headers.get("Location", "")
+
+    def log_in(self, login_value, password_value):
+        self.token = None
+        location = self.post(
+            "/Login", {"Login": login_value, "Password": password_value}, "/Login"
+        )
+        if "/Login" in location:
+            raise SeedError(f"не удалось войти как {login_value}")
+        # после входа старый токен (выданный анониму) уже не подходит
+        self.token = None
+        self.login = login_value
+        return self
+
+    def close(self):
+        self.http.close()
+
+
+class Seeder:
+    """
+    Создаёт данные и помнит, что создано, чтобы убрать это одной пачкой в конце.
+    Админская сессия общая; у каждого автора курсов своя сессия — курс может
+    удалить только его автор.
+    """
+
+    def __init__(self, base_url, admin_creds, verify=None):
+        self.base_url = base_url
+        self.admin_creds = admin_creds
+        self.verify = tls_verify() if verify is None else verify
+        self._admin = None
+        self.sessions = {}
+        self.users = []
+        # (login, password, course_id или None, название)
+        self.courses = []
+
+    @property
+    def admin(self):
+        if self._admin is None:
+            self._admin = HttpSession(self.base_url, self.verify).log_in(*self.admin_creds)
+        return self._admin
+
+    def session_for(self, login_value, password_value):
+        session = self.sessions.get(login_value)
+        if session is None:
+            session = HttpSession(self.base_url, self.verify).log_in(login_value, password_value)
+            self.sessions[login_value] = session
+        return session
+
+    # ---------------- пользователи ----------------
+
+    def user(self, login_value, password_value="SeleniumPass123!", name="Selenium Seed User"):
+        self.admin.post(
+            "/Admin/Users",
+            {
+                "InputUser.Id": "0",
+                "InputUser.Login": login_value,
+                "InputUser.Name": name,
+                "InputUser.Password": password_value,
+                "InputUser.Email": "",
+            },
+            "/Admin/Users",
+        )
+        self.users.append(login_value)
+        return SeededUser(login_value, password_value, name)
+
+    def track_user(self, login_value):
+        # пользователь создан через UI, но удалить его тоже надо
+        self.users.append(login_value)
+
+    def user_ids(self):
+        page = self.admin.get("/Admin/Users")
+        return {html.unescape(login): int(uid) for uid, login in _USER_ROW_RE.findall(page)}
+
+    # ---------------- курсы и задания ----------------
+
+    def course(self, author, name, description="Курс создан сидингом автотестов.",
+               tasks=(), participants=()):
+        session = self.session_for(author.login, author.password)
+        session.post(
+            "/Courses?handler=Create",
+            {"NewCourseName": name, "NewCourseDescription": description},
+            "/Courses",
+        )
+        course_id = self._course_id(session, name)
+        self.courses.append((author.login, author.password, course_id, name))
+
+        edit = f"/Courses/Edit/{course_id}"
+        for login_value in participants:
+            session.post(f"{edit}?handler=AddUser", {"NewUserLogin": login_value}, edit)
+        for task_name in tasks:
+            session.post(
+                f"{edit}?handler=AddTask",
+                {"NewTaskName": task_name, "NewTaskDescription": "Задание создано сидингом автотестов."},
+                edit,
+            )
+        task_ids = self._task_ids(session, course_id, tasks) if tasks else []
+        return SeededCourse(course_id, name, author, task_ids)
+
+    def track_course(self, login_value, password_value, name):
+        # курс создан через UI; id узнаем при уборке
+        self.courses.append((login_value, password_value, None, name))
+
+    @staticmethod
+    def _course_id(session, name):
+        # список "Я автор": <a href="/Courses/Edit/ID" ...><b>Название</b>
+        page = session.get("/Courses")
+        pattern = r'href="/Courses/Edit/(\d+)"[^>]*>\s*<b>' + re.escape(html.escape(name)) + "</b>"
+        ids = re.findall(pattern, page)
+        if not ids:
+            raise SeedError(f"курс {name!r} не найден в /Courses")
+        return int(ids[-1])
+
+    @staticmethod
+    def _task_ids(session, course_id, names):
+        page = session.get(f"/Courses/Edit/{course_id}")
+        ids = []
+        for name in names:
+            pattern = r'href="/Tasks/Edit/(\d+)"[^>]*>' + re.escape(html.escape(name)) + "</a>"
+            found = re.findall(pattern, page)
+            if not found:
+                raise SeedError(f"задание {name!r} не найдено в курсе {course_id}")
+            ids.append(int(found[-1]))
+        return ids
+
+    # ---------------- уборка ----------------
+
+    def cleanup(self):
+        """
+        Удаляет всё созданное за сессию: сначала курсы (вместе с ними уходят
+        задания и ответы), потом пользователей. Ошибки (в том числе сетевые и
+        таймауты) не прерывают уборку — остаток просто печатается.
+        """
+        failed = []
+
+        for login_value, password_value, course_id, name in self.courses:
+            try:
+                session = self.session_for(login_value, password_value)
+                if course_id is None:
+                    course_id = self._course_id(session, name)
+                edit = f"/Courses/Edit/{course_id}"
+                session.post(f"{edit}?handler=DeleteCourse", {}, edit)
+            except (SeedError, requests.RequestException) as e:
+                failed.append(f"курс {name}: {e}")
+
+        if self.users:
+            try:
+                ids = self.user_ids()
+            except (SeedError, requests.RequestException) as e:
+                ids = {}
+                failed.append(f"список пользователей: {e}")
+            for login_value in self.users:
+                # пользователя мог удалить сам тест
+                if login_value not in ids:
+                    continue
+                try:
+                    self.admin.post(
+                        "/Admin/Users?handler=Delete", {"id": str(ids[login_value])}, "/Admin/Users"
+                    )
+                except (SeedError, requests.RequestException) as e:
+                    failed.append(f"пользователь {login_value}: {e}")
+
+        print(f"[INFO] уборка: курсов {len(self.courses)}, пользователей {len(self.users)}")
+        for line in failed:
+            print(f"[WARN] не убрано — {line}")
+
+        self.courses.clear()
+        self.users.clear()
+        for session in self.sessions.values():
+            session.close()
+        if self._admin is not None:
+            self._admin.close()
@@ -1,7 +1,10 @@
-from time import sleep
-import uuid
+import pytest
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
+
+from pages import AdminUsersPage
+
+# страницы приложения, от которых зависит тест (--changed-only, schedule.py)
+pytestmark = pytest.mark.target_pages("Login", "Admin/Users")
 
 
 def test_admin_users_page_accessible_for_admin(
@@ -9,40 +12,24 @@ def test_admin_users_page_accessible_for_admin(
 ):
     admin_login, admin_password = admin_creds
     login(admin_login, admin_password)
-    driver.get(f"{base_url}/Admin/Users")
 
-    wait.until(lambda d: "Список пользователей" in d.page_source)
-    assert "Список пользователей" in driver.page_source
+    # open() ждёт заголовок "Список пользователей"
+    AdminUsersPage(driver, wait, base_url).open()
+    assert "Список пользователей" in driver.find_element(By.TAG_NAME, "h2").text
     
 
 
-def test_admin_can_create_new_user(driver, wait, base_url, login, admin_creds):
+def test_admin_can_create_new_user(driver, wait, base_url, login, admin_creds, unique_name, seeder):
     admin_login, admin_password = admin_creds
     login(admin_login, admin_password)
 
-    driver.get(f"{base_url}/Admin/Users")
-
-    login_value = "selenium_user_" + uuid.uuid4().hex[:5]
-
-    # Для asp-for="InputUser.Login" Razor сгенерит id="InputUser_Login"
-    login_input = wait.until(
-        EC.visibility_of_element_located((By.ID, "InputUser_Login"))
-    )
-    name_input = driver.find_element(By.ID, "InputUser_Name")
-    password_input = driver.find_element(By.ID, "InputUser_Password")
-
-    login_input.clear()
-    login_input.send_keys(login_value)
-
-    name_input.clear()
-    name_input.send_keys("Selenium Test User")
+    page = AdminUsersPage(driver, wait, base_url).open()
 
-    password_input.clear()
-    password_input.send_keys("SeleniumPass123!")
+    login_value = unique_name("selenium_user_")
+    # создаём через форму — это и проверяем; а убирает его сидинг в конце сессии
+    seeder.track_user(login_value)
 
-    form = login_input.find_element(By.XPATH, "./ancestor::form")
-    submit = form.find_element(By.CSS_SELECTOR, "button[type='submit']")
-    submit.click()
+    page.create_user(login_value, "Selenium Test User", "SeleniumPass123!")
 
-    wait.until(lambda d: login_value in d.page_source)
-    assert login_value in driver.page_source
+    page.user_row(login_value)
+    assert page.has_user(login_value)
@@ -1,15 +1,24 @@
-import uuid
-
+import pytest
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+
+from pages import AdminUsersPage
+from waits import page_update, row_with_cell
 
+# страницы приложения, от которых зависит тест (--changed-only, schedule.py)
+pytestmark = pytest.mark.target_pages("Login", "Admin/Users")
 
-def test_admin_can_block_user(driver, wait, base_url, login, admin_creds):
+
+def test_admin_can_block_user(driver, wait, base_url, login, admin_creds, seeded_user):
     """
     Сценарий (как планировалось по задаче):
       1) Админ заходит в /Admin/Users
-      2) Создаёт нового пользователя
+      2) Находит нового пользователя (создан сидингом по HTTP)
       3) В таблице у пользователя по умолчанию статус 'Активен'
       4) В той же строке жмёт кнопку 'Блокировать'
       5) Подтверждает стандартное окно confirm()
@@ -19,47 +28,15 @@ def test_admin_can_block_user(driver, wait, base_url, login, admin_creds):
     admin_login, admin_password = admin_creds
     login(admin_login, admin_password)
 
-    driver.get(f"{base_url}/Admin/Users")
-
-    # 1. Создаём нового пользователя (как в других тестах)
-    login_value = "selenium_block_" + uuid.uuid4().hex[:5]
-
-    print(f"[INFO] Создаю пользователя для блокировки: {login_value}")
-
-    login_input = wait.until(
-        EC.visibility_of_element_located((By.ID, "InputUser_Login"))
-    )
-    name_input = driver.find_element(By.ID, "InputUser_Name")
-    password_input = driver.find_element(By.ID, "InputUser_Password")
-
-    login_input.clear()
-    login_input.send_keys(login_value)
-
-    name_input.clear()
-    name_input.send_keys("Selenium Block Test User")
+    # 1. Пользователь для блокировки уже создан сидингом
+    login_value = seeded_user.login
+    print(f"[INFO] Пользователь для блокировки: {login_value}")
 
-    password_input.clear()
-    password_input.send_keys("SeleniumPass123!")
+    page = AdminUsersPage(driver, wait, base_url).open()
 
-    form = login_input.find_element(By.XPATH, "./ancestor::form")
-    submit = form.find_element(By.CSS_SELECTOR, "button[type='submit']")
-    submit.click()
-
-    # 2. Убеждаемся, что пользователь появился в таблице
-    print("[INFO] Жду появления пользователя в таблице...")
-    wait.until(lambda d: login_value in d.page_source)
-    print("[INFO] Пользователь появился в таблице.")
-
-    # 3. Находим строку таблицы с этим логином
-    print("[INFO] Ищу строку <tr> с этим логином...")
-    row = wait.until(
-        EC.presence_of_element_located(
-            (
-                By.XPATH,
-                f"//tr[td[contains(normalize-space(), '{login_value}')]]",
-            )
-        )
-    )
+    # 2-3. Убеждаемся, что пользователь появился в таблице, и берём его строку
+    print("[INFO] Жду появления строки <tr> с этим логином...")
+    row = page.user_row(login_value)
     print("[INFO] Строка найдена.")
 
     # 3.1. (Планируемое поведение) Проверяем, что статус изначально 'Активен'
@@ -78,42 +55,39 @@ def test_admin_can_block_user(driver, wait, base_url, login, admin_creds):
 
     # 4. Находим кнопку 'Блокировать' рядом с 'Удалить'
     print("[INFO] Ищу кнопку 'Блокировать' в этой строке...")
-    block_button = row.find_element(
-        By.XPATH, ".//button[contains(normalize-space(), 'Блокировать')]"
-    )
-    print("[INFO] Нажимаю кнопку 'Блокировать'...")
-    block_button.click()
+    block_button = page.row_button(login_value, "Блокировать")
 
-    # 5. Подтверждаем стандартную модалку confirm()/alert
-    try:
-        print("[INFO] Жду появления стандартного окна подтверждения (alert/confirm)...")
-        alert = wait.until(EC.alert_is_present())
-        print(f"[INFO] Текст модалки: {alert.text!r}")
-        alert.accept()
-        print("[INFO] Подтверждение блокировки принято (alert.accept()).")
-    except TimeoutException:
-        print("[WARN] Окно подтверждения не появилось — возможно, пока не реализовано.")
+    # 5. Жмём и подтверждаем стандартную модалку confirm()/alert;
+    # page_update ждёт ответа сервера (или обновления DOM скриптом)
+    with page_update(driver, wait):
+        print("[INFO] Нажимаю кнопку 'Блокировать'...")
+        block_button.click()
+        try:
+            print("[INFO] Жду появления стандартного окна подтверждения (alert/confirm)...")
+            alert = wait.until(EC.alert_is_present())
+            print(f"[INFO] Текст модалки: {alert.text!r}")
+            alert.accept()
+            print("[INFO] Подтверждение блокировки принято (alert.accept()).")
+        except TimeoutException:
+            print("[WARN] Окно подтверждения не появилось — возможно, пока не реализовано.")
 
     # 6. Проверяем, что статус изменился на 'Заблокирован'
     print("[INFO] Жду, когда статус пользователя изменится на 'Заблокирован'...")
 
     def user_blocked(d):
         try:
-            row = d.find_element(
-                By.XPATH,
-                f"//tr[td[contains(normalize-space(), '{login_value}')]]",
-            )
+            row = d.find_element(*row_with_cell(login_value))
             blocked_cell = row.find_element(
                 By.XPATH, ".//td[contains(normalize-space(), 'Заблокирован')]"
             )
             return "Заблокирован" in blocked_cell.text
-        except Exception:
+        except (NoSuchElementException, StaleElementReferenceException):
+            # строку перерисовали между find_element и .text — проверим в следующий раз
             return False
 
     wait.until(user_blocked)
     print("[INFO] Статус пользователя изменился на 'Заблокирован'.")
 
     # Финальный ассерт
-    page_source = driver.page_source
-    assert "Заблокирован" in page_source
+    assert user_blocked(driver)
     print("[INFO] Тест: админ может блокировать пользователя — сценарий описан.")
@@ -1,6 +1,10 @@
+import pytest
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 
+# страницы приложения, от которых зависит тест (--changed-only, schedule.py)
+pytestmark = pytest.mark.target_pages("Login", "Index", "Admin/Panel")
+
 
 def test_login_invalid_stays_on_login(driver, wait, base_url, login):
     login("wrong", "wrong")
@@ -12,7 +16,8 @@ def test_login_invalid_stays_on_login(driver, wait, base_url, login):
 
 def test_login_valid_redirects_to_index(driver, wait, base_url, login, user_creds):
     user_login, user_password = user_creds
-    login(user_login, user_password)
+    # проверяем саму форму входа — без подстановки сохранённой cookie
+    login(user_login, user_password, fresh=True)
 
     # Index.cshtml: [Authorize], после логина редирект туда
     wait.until(
@@ -29,10 +34,11 @@ def test_index_for_user_shows_links(driver, wait, base_url, login, user_creds):
     login(user_login, user_password)
 
     wait.until(EC.presence_of_element_located((By.TAG_NAME, "ul")))
-    page_source = driver.page_source
+    # видимый текст страницы, без сериализации всего DOM
+    page_text = driver.find_element(By.TAG_NAME, "body").text
 
-    assert "Список курсов" in page_source
-    assert "Мои ответы" in page_source
+    assert "Список курсов" in page_text
+    assert "Мои ответы" in page_text
 
 
 def test_index_for_admin_shows_admin_link(driver, wait, base_url, login, admin_creds):
@@ -40,6 +46,7 @@ def test_index_for_admin_shows_admin_link(driver, wait, base_url, login, admin_c
     login(admin_login, admin_password)
 
     wait.until(EC.presence_of_element_located((By.TAG_NAME, "ul")))
-    page_source = driver.page_source
+    # видимый текст страницы, без сериализации всего DOM
+    page_text = driver.find_element(By.TAG_NAME, "body").text
 
-    assert "Админ панель" in page_source
+    assert "Админ панель" in page_text
@@ -0,0 +1,116 @@
+"""
+Точечные ожидания для UI-тестов вместо sleep() и опроса driver.page_source.
+
+page_source на каждом опросе сериализует весь DOM и гоняет его по протоколу
+WebDriver, а sleep() ждёт фиксированное время, даже если сервер ответил сразу.
+Здесь ждём конкретное событие: ушла старая страница (POST/редирект), появился
+элемент/текст, либо сработал MutationObserver на странице (обновление без
+перезагрузки).
+"""
+from contextlib import contextmanager
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+
+# Флаг, который выставляет MutationObserver; живёт в window страницы, поэтому
+# после перезагрузки сам пропадает.
+# attributes не слушаем: фокус/hover на кнопке меняет class ещё до ответа сервера
+DOM_FLAG = "__trpDomChanged"
+
+_OBSERVER_JS = f"""
+window.{DOM_FLAG} = false;
+if (window.__trpObserver) window.__trpObserver.disconnect();
+window.__trpObserver = new MutationObserver(function () {{ window.{DOM_FLAG} = true; }});
+window.__trpObserver.observe(document.documentElement,
+    {{childList: true, subtree: true, characterData: true}});
+"""
+
+
+def xpath_literal(text):
+    # строка для XPath 1.0: в логинах/названиях могут быть и ', и "
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    parts = text.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+
+
+def row_with_cell(text):
+    # строка таблицы, где ячейка равна text целиком: contains() путал бы
+    # selenium_user_gw0_..._1 и selenium_user_gw0_..._10
+    return (By.XPATH, f"//tr[td[normalize-space()={xpath_literal(text)}]]")
+
+
+def document_ready(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def dom_changed(driver):
+    """
+    Условие для wait.until: после watch_dom() на странице что-то поменялось,
+    либо страница вообще перезагрузилась (флага больше нет).
+    """
+    return driver.execute_script(f"return window.{DOM_FLAG} !== false")
+
+
+def watch_dom(driver):
+    """Ставит MutationObserver на текущую страницу, сбрасывая флаг."""
+    driver.execute_script(_OBSERVER_JS)
+
+
+def staleness_or_mutation(old_root):
+    """
+    Страница ушла (old_root устарел) или, если действие обработал JS без
+    перезагрузки, DOM изменился.
+    """
+    def _condition(driver):
+        try:
+            old_root.is_enabled()
+        except StaleElementReferenceException:
+            return True
+        return dom_changed(driver)
+
+    return _condition
+
+
+@contextmanager
+def page_update(driver, wait):
+    """
+    Обёртка над действием, после которого меняется страница (submit, клик по
+    кнопке формы):
+
+        with page_update(driver, wait):
+            submit.click()
+
+    Если кнопка вызывает confirm(), клик и accept() оба внутри блока: пока
+    открыт alert, скрипты на странице выполнить нельзя.
+
+    Выход из блока — когда старый документ ушёл или DOM изменился, и новый
+    документ догрузился. Ни одного фиксированного sleep().
+    """
+    old_root = driver.find_element(By.TAG_NAME, "html")
+    watch_dom(driver)
+    yield
+    wait.until(staleness_or_mutation(old_root))
+    wait.until(document_ready)
+
+
+def visible(wait, locator):
+    return wait.until(EC.visibility_of_element_located(locator))
+
+
+def clickable(wait, locator):
+    return wait.until(EC.element_to_be_clickable(locator))
+
+
+def text_in(wait, locator, text):
+    # текст в конкретном элементе, а не во всём page_source
+    return wait.until(EC.text_to_be_present_in_element(locator, text))
+
+
+def gone(wait, locator):
+    # элемента нет в DOM; find_elements без неявного ожидания отвечает сразу
+    return wait.until(lambda d: not d.find_elements(*locator))
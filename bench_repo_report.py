@@ -0,0 +1,338 @@
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+# Бенчмарк generate_repo_report.py на синтетических репозиториях.
+#
+#   python bench_repo_report.py --files 5000 --commits 2000 --repeat 3
+#
+# Репозиторий генерируется один раз через git fast-import (секунды даже на десятках
+# тысяч коммитов) и переиспользуется, пока не поменялись параметры. Каждый прогон
+# варианта идёт в отдельном процессе: время фаз берём из DIAG (как --stats), пиковую
+# память — из ru_maxrss процесса. Результаты дописываются в JSONL; при повторном
+# запуске с теми же параметрами печатается сравнение с прошлым результатом.
+
+BENCH_DIR = os.path.join("_repo_tmp", "bench")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.jsonl")
+BENCH_END = dt.date(2025, 12, 29)  # фиксированный конец истории: прогоны сравнимы между днями
+
+# текстовые расширения и их доля среди файлов (остальное — --binary-ratio)
+TEXT_MIX = [
+    (".cs", 45), (".cshtml", 10), (".js", 10), (".css", 5), (".json", 5),
+    (".xml", 5), (".md", 5), (".yml", 3), (".txt", 2),
+]
+BINARY_MIX = [".png", ".dll", ".vpp", ""]
+
+# варианты запуска: имя -> дополнительные аргументы generate_repo_report.py
+VARIANTS = {
+    "baseline": ["--no-cache"],
+    "jobs4": ["--no-cache", "--jobs", "4"],
+    "cache": [],  # --cache подставляется свой: первый прогон холодный, дальше тёплые
+    "git-scan": ["--no-cache", "--git-scan"],
+    "classify": ["--no-cache", "--classify"],
+    "details": ["--no-cache", "--details"],
+    "streaming": ["--no-cache", "--details", "--streaming"],
+    "json": ["--no-cache", "--details", "--format", "json"],
+}
+
+def repo_params(args) -> dict:
+    return {
+        "files": args.files,
+        "commits": args.commits,
+        "authors": args.authors,
+        "lines": args.lines,
+        "sigma": args.sigma,
+        "binary_ratio": args.binary_ratio,
+        "weeks": args.weeks,
+        "seed": args.seed,
+    }
+
+def params_slug(params: dict) -> str:
+    key = json.dumps(params, sort_keys=True)
+    return f"f{params['files']}-c{params['commits']}-" + hashlib.sha1(key.encode()).hexdigest()[:8]
+
+def code_line(rnd: random.Random, i: int) -> bytes:
+    # немного разнообразия для --classify: отступы, комментарии, пустые строки
+    r = rnd.random()
+    if r < 0.12:
+        return b""
+    if r < 0.2:
+        return b"    // comment %d" % i
+    return b"    var x%d = Compute(%d, \"%s\");" % (i, rnd.randrange(1000), b"abcdef"[: rnd.randrange(1, 6)])
+
+def file_lines(rnd: random.Random, median: int, sigma: float) -> int:
+    # логнормальное распределение: много мелких файлов и редкие очень большие
+    return max(1, int(rnd.lognormvariate(0, sigma) * median))
+
+def gen_repo(path: str, params: dict):
+    # Поток для git fast-import: первый коммит добавляет все файлы, дальше каждый
+    # коммит меняет 1-5 файлов (вставка/удаление строк), изредка добавляет новый.
+    # Даты равномерно растянуты на params["weeks"] недель до BENCH_END.
+    rnd = random.Random(params["seed"])
+    os.makedirs(path)
+    subprocess.run(["git", "init", "-q", path], check=True)
+    branch = subprocess.run(["git", "symbolic-ref", "HEAD"], cwd=path, check=True,
+                            stdout=subprocess.PIPE, text=True).stdout.strip()
+
+    exts = [e for e, _ in TEXT_MIX]
+    weights = [w for _, w in TEXT_MIX]
+    authors = [(f"Dev {i}", f"dev{i}@example.com") for i in range(params["authors"])]
+    files = {}  # путь -> строки (текст) или bytes (бинарный)
+
+    def new_file():
+        n = len(files)
+        folder = f"src/m{n % 37}/p{n % 11}"
+        if rnd.random() < params["binary_ratio"]:
+            ext = rnd.choice(BINARY_MIX)
+            files[f"{folder}/asset{n}{ext}"] = rnd.randbytes(rnd.randrange(256, 64 * 1024))
+        else:
+            ext = rnd.choices(exts, weights)[0]
+            lines = file_lines(rnd, params["lines"], params["sigma"])
+            files[f"{folder}/file{n}{ext}"] = [code_line(rnd, i) for i in range(lines)]
+
+    for _ in range(params["files"]):
+        new_file()
+
+    span = params["weeks"] * 7 * 86400
+    end_ts = int(dt.datetime.combine(BENCH_END, dt.time(12)).timestamp())
+    ncommits = max(1, params["commits"])
+
+    p = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path, stdin=subprocess.PIPE)
+    out = p.stdin
+
+    def data(blob: bytes):
+        out.write(b"data %d\n" % len(blob))
+        out.write(blob)
+        out.write(b"\n")
+
+    def content(v) -> bytes:
+        return v if isinstance(v, bytes) else b"\n".join(v) + b"\n"
+
+    for c in range(ncommits):
+        name, email = authors[c % len(authors)] if c % 3 else rnd.choice(authors)
+        ts = end_ts - span + span * c // ncommits
+        if c == 0:
+            changed = list(files)
+        else:
+            changed = rnd.sample(list(files), min(len(files), rnd.randint(1, 5)))
+            if rnd.random() < 0.05:
+                new_file()
+                changed.append(next(reversed(files)))
+            for f in changed:
+                v = files[f]
+                if isinstance(v, bytes):
+                    files[f] = rnd.randbytes(len(v))
+                    continue
+                for _ in range(rnd.randint(1, 8)):
+                    i = rnd.randrange(len(v) + 1)
+                    if v and rnd.random() < 0.4:
+                        del v[min(i, len(v) - 1)]
+                    else:
+                        v.insert(i, code_line(rnd, i))
+        out.write(b"commit %s\n" % branch.encode())
+        out.write(b"author %s <%s> %d +0000\n" % (name.encode(), email.encode(), ts))
+        out.write(b"committer %s <%s> %d +0000\n" % (name.encode(), email.encode(), ts))
+        data(b"commit %d" % c)
+        for f in changed:
+            out.write(b"M 100644 inline %s\n" % f.encode())
+            data(content(files[f]))
+        out.write(b"\n")
+    out.close()
+    if p.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    subprocess.run(["git", "reset", "--hard", "-q"], cwd=path, check=True)
+
+def ensure_bench_repo(params: dict, regen: bool = False) -> str:
+    path = os.path.join(BENCH_DIR, "repos", params_slug(params))
+    marker = os.path.join(path, ".git", "bench_params.json")
+    if os.path.exists(marker) and not regen:
+        return path
+    if os.path.exists(path):
+        from generate_repo_report import remove_tree
+        remove_tree(path)
+    t0 = time.perf_counter()
+    gen_repo(path, params)
+    with open(marker, "w", encoding="utf-8") as fh:
+        json.dump(params, fh)
+    print(f"репозиторий {path} сгенерирован за {time.perf_counter() - t0:.1f} s")
+    return path
+
+def run_child(argv: list) -> dict:
+    # Один прогон generate_repo_report.main() в этом процессе (вызывается как --child).
+    import contextlib
+    import io
+
+    import generate_repo_report as grr
+
+    sys.argv = ["generate_repo_report.py", *argv]
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        grr.main()
+    wall = time.perf_counter() - t0
+    try:
+        import resource
+        # Linux отдаёт KB, macOS — байты
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_kb = rss // 1024 if sys.platform == "darwin" else rss
+    except ImportError:  # Windows
+        peak_kb = None
+    return {
+        "wall": wall,
+        "peak_rss_kb": peak_kb,
+        "phases": {name.strip(): sec for name, sec in grr.DIAG["phases"].items()},
+        "counters": dict(grr.DIAG["counters"]),
+    }
+
+def run_variant(repo: str, variant: str, repeat: int, params: dict) -> list:
+    work = os.path.join(BENCH_DIR, "work", variant)
+    os.makedirs(work, exist_ok=True)
+    extra = list(VARIANTS[variant])
+    if variant == "cache":
+        cache = os.path.join(work, "scan_cache.sqlite")
+        if os.path.exists(cache):
+            os.remove(cache)
+        extra += ["--cache", cache]
+    fmt = extra[extra.index("--format") + 1] if "--format" in extra else "xlsx"
+    start = BENCH_END - dt.timedelta(weeks=params["weeks"])
+    argv = ["--repo-path", repo, "--start", start.isoformat(), "--end", BENCH_END.isoformat(),
+            "--out", os.path.join(work, f"report.{fmt}"), *extra]
+
+    runs = []
+    for _ in range(repeat):
+        p = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", *argv],
+                           stdout=subprocess.PIPE, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"вариант {variant} упал (код {p.returncode})")
+        runs.append(json.loads(p.stdout.strip().splitlines()[-1]))
+    return runs
+
+def summarize(runs: list) -> dict:
+    # медиана по прогонам: устойчивее к разовым всплескам, чем среднее
+    phases = {}
+    for r in runs:
+        for name in r["phases"]:
+            phases.setdefault(name, [])
+    for name in phases:
+        phases[name] = round(statistics.median(r["phases"].get(name, 0.0) for r in runs), 4)
+    peaks = [r["peak_rss_kb"] for r in runs if r["peak_rss_kb"] is not None]
+    return {
+        "wall": round(statistics.median(r["wall"] for r in runs), 4),
+        "wall_min": round(min(r["wall"] for r in runs), 4),
+        "peak_rss_kb": max(peaks) if peaks else None,
+        "phases": phases,
+        "counters": runs[-1]["counters"],
+    }
+
+def tool_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def load_results(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+def previous_result(results: list, params: dict, variant: str) -> dict | None:
+    for rec in reversed(results):
+        if rec["params"] == params and rec["variant"] == variant:
+            return rec
+    return None
+
+def delta(new: float | None, old: float | None) -> str:
+    if new is None or not old:
+        return ""
+    return f"{(new - old) / old * 100:+.0f}%"
+
+def print_summary(variant: str, summary: dict, prev: dict | None, threshold: float) -> bool:
+    # печатает фазы варианта рядом с прошлым результатом; True — есть регрессия
+    old = prev["summary"] if prev else {"phases": {}, "wall": None, "peak_rss_kb": None}
+    print(f"\n{variant}" + (f"  (сравнение с {prev['revision'] or '?'} от {prev['ts']})" if prev else ""))
+    print(f"  {'фаза':<28} {'s':>9} {'было':>9} {'Δ':>7}")
+    rows = list(summary["phases"].items()) + [("всего", summary["wall"])]
+    regress = False
+    for name, sec in rows:
+        was = old["wall"] if name == "всего" else old["phases"].get(name)
+        mark = ""
+        # короткие фазы шумят сильнее порога — их не считаем регрессией
+        if was and sec > 0.05 and (sec - was) / was * 100 > threshold:
+            mark = "  !"
+            regress = True
+        was_s = f"{was:9.3f}" if was is not None else f"{'':>9}"
+        print(f"  {name:<28} {sec:9.3f} {was_s} {delta(sec, was):>7}{mark}")
+    peak, was = summary["peak_rss_kb"], old["peak_rss_kb"]
+    if peak is not None:
+        mark = "  !" if was and (peak - was) / was * 100 > threshold else ""
+        regress = regress or bool(mark)
+        was_s = f"{was / 1024:9.1f}" if was else f"{'':>9}"
+        print(f"  {'пиковая память, MB':<28} {peak / 1024:9.1f} {was_s} {delta(peak, was):>7}{mark}")
+    return regress
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(run_child(sys.argv[2:])))
+        return
+
+    ap = argparse.ArgumentParser(description="Бенчмарк generate_repo_report.py на синтетических репозиториях")
+    ap.add_argument("--files", type=int, default=2000, help="файлов в первом коммите")
+    ap.add_argument("--commits", type=int, default=1000)
+    ap.add_argument("--authors", type=int, default=12)
+    ap.add_argument("--lines", type=int, default=120, help="медиана строк в текстовом файле")
+    ap.add_argument("--sigma", type=float, default=1.0, help="разброс размеров (логнормальное распределение)")
+    ap.add_argument("--binary-ratio", type=float, default=0.05, help="доля бинарных файлов")
+    ap.add_argument("--weeks", type=int, default=26, help="на сколько недель растянута история (и отчёт)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--variants", default="baseline,jobs4,cache,git-scan,streaming",
+                    help=f"через запятую, из: {', '.join(VARIANTS)}")
+    ap.add_argument("--repeat", type=int, default=3, help="прогонов на вариант (берётся медиана)")
+    ap.add_argument("--regen", action="store_true", help="пересоздать синтетический репозиторий")
+    ap.add_argument("--results", default=RESULTS_PATH, help="JSONL с результатами (дописывается)")
+    ap.add_argument("--threshold", type=float, default=10.0,
+                    help="рост времени/памяти в %% относительно прошлого результата, считающийся регрессией")
+    args = ap.parse_args()
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    unknown = [v for v in variants if v not in VARIANTS]
+    if unknown:
+        ap.error(f"неизвестные варианты: {', '.join(unknown)}")
+
+    params = repo_params(args)
+    repo = ensure_bench_repo(params, regen=args.regen)
+    results = load_results(args.results)
+    revision = tool_revision()
+    regress = False
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    for variant in variants:
+        runs = run_variant(repo, variant, args.repeat, params)
+        rec = {
+            "ts": dt.datetime.now().isoformat(timespec="seconds"),
+            "revision": revision,
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "params": params,
+            "variant": variant,
+            "summary": summarize(runs),
+            "runs": runs,
+        }
+        regress |= print_summary(variant, rec["summary"], previous_result(results, params, variant),
+                                 args.threshold)
+        with open(args.results, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    print(f"\nрезультаты: {args.results}")
+    sys.exit(1 if regress else 0)
+
+if __name__ == "__main__":
+    main()
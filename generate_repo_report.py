@@ -1,20 +1,23 @@
 import argparse
 import datetime as dt
 import os
-import subprocess
-from collections import Counter, defaultdict
-from pathlib import Path
+import sys
+import time
+import _thread
+from collections import Counter, defaultdict, namedtuple
+from contextlib import contextmanager
+from itertools import zip_longest
+
+# Остальные модули (subprocess, sqlite3, concurrent.futures, openpyxl, ...) импортируются
+# внутри функций, которым они нужны: скрипт часто запускается из cron тысячами раз,
+# и ошибка в аргументах или вывод в json не должны платить за их загрузку.
+# Замерить холодный старт: --profile-startup.
 
-from openpyxl import Workbook
-from openpyxl.chart import BarChart, PieChart, Reference
-from openpyxl.chart.label import DataLabelList
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
 
 
 EXCLUDE_DIRS = {
     ".git", ".vs", "bin", "obj", ".idea", ".vscode", "node_modules",
-    "__pycache__", ".pytest_cache", "dist", "build", "out"
+    "__pycache__", ".pytest_cache", "dist", "build", "out", "_repo_tmp"
 }
 BINARY_EXTS = {
     ".png",".jpg",".jpeg",".gif",".webp",".ico",".pdf",".dll",".exe",".pdb",".db",
@@ -41,8 +44,152 @@ LANG_BY_EXT = {
     ".config": "Config",
 }
 
-def run(cmd, cwd=None):
-    p = subprocess.run(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+# Сгенерированные файлы по имени: их содержимое не читаем вовсе (см. sniff_file)
+GENERATED_NAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "packages.lock.json",
+    "composer.lock", "poetry.lock", "cargo.lock", "gemfile.lock"
+}
+GENERATED_SUFFIXES = (
+    ".min.js", ".min.css", ".map", ".lock", ".designer.cs", ".g.cs", ".g.i.cs"
+)
+GENERATED_MARKERS = (b"<auto-generated", b"<autogenerated", b"@generated", b"do not edit")
+
+# Синтаксис комментариев для --classify по расширению (как LANG_BY_EXT):
+# (маркеры строчных комментариев, пары начало/конец блочных). Для остальных
+# расширений строки делятся только на код и пустые.
+C_COMMENTS = ((b"//",), ((b"/*", b"*/"),))
+XML_COMMENTS = ((), ((b"<!--", b"-->"),))
+HASH_COMMENTS = ((b"#",), ())
+RAZOR_COMMENTS = ((b"//",), ((b"@*", b"*@"), (b"<!--", b"-->"), (b"/*", b"*/")))
+COMMENT_SYNTAX = {
+    ".cs": C_COMMENTS,
+    ".cshtml": RAZOR_COMMENTS,
+    ".razor": RAZOR_COMMENTS,
+    ".html": XML_COMMENTS,
+    ".css": ((), ((b"/*", b"*/"),)),
+    ".js": C_COMMENTS,
+    ".ts": C_COMMENTS,
+    ".xml": XML_COMMENTS,
+    ".yml": HASH_COMMENTS,
+    ".yaml": HASH_COMMENTS,
+    ".sln": HASH_COMMENTS,
+    ".csproj": XML_COMMENTS,
+    ".props": XML_COMMENTS,
+    ".targets": XML_COMMENTS,
+    ".config": XML_COMMENTS,
+    ".py": HASH_COMMENTS,
+}
+
+# Диагностика (--stats): время фаз и счётчики. Собирается всегда — это пара
+# perf_counter() на фазу или вызов git, — а выводится только по --stats.
+# Потоки сканирования отдают свои счётчики через stats (files_read, bytes_read),
+# которые сливает merge_stats(); вызовы git считаются под замком.
+# running — фазы, которые ещё идут: в их записи пока 0 (например, write_report,
+# пока пишется сам лист диагностики), и в отчёт они не попадают.
+DIAG = {"phases": {}, "counters": Counter(), "running": set()}
+_phase_depth = [0]
+_diag_lock = _thread.allocate_lock()  # счётчики git пишутся и из потока сканирования
+
+def reset_diag():
+    DIAG["phases"].clear()
+    DIAG["counters"].clear()
+
+@contextmanager
+def phase(name: str):
+    # вложенные фазы хранятся с отступом и входят во время внешней
+    key = "  " * _phase_depth[0] + name
+    DIAG["phases"].setdefault(key, 0.0)  # порядок — по началу фазы, а не по концу
+    DIAG["running"].add(key)
+    _phase_depth[0] += 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phase_depth[0] -= 1
+        DIAG["running"].discard(key)
+        add_phase(key, time.perf_counter() - t0)
+
+def add_phase(key: str, seconds: float):
+    DIAG["phases"][key] = DIAG["phases"].get(key, 0.0) + seconds
+
+def count(name: str, n=1):
+    with _diag_lock:
+        DIAG["counters"][name] += n
+
+def diag_rows(diag: dict) -> list:
+    # [(раздел, показатель, значение)]: завершённые фазы в секундах, затем счётчики
+    rows = [("phase", name, round(sec, 4)) for name, sec in diag["phases"].items()
+            if name not in diag["running"]]
+    rows += [("counter", name, round(v, 4) if isinstance(v, float) else v)
+             for name, v in sorted(diag["counters"].items())]
+    return rows
+
+def print_diag(diag: dict, wall: float):
+    print("\nStats:")
+    print(f"  {'фаза':<40} {'s':>10}")
+    for section, name, value in diag_rows(diag):
+        if section == "phase":
+            print(f"  {name:<40} {value:10.3f}")
+    print(f"  {'время процесса целиком':<40} {wall:10.3f}")
+    print(f"  {'счётчик':<40} {'':>10}")
+    for section, name, value in diag_rows(diag):
+        if section == "counter":
+            print(f"  {name:<40} {value:>10}")
+
+def count_git(t0: float):
+    # время от запуска подпроцесса git до его завершения
+    count("git_calls")
+    count("git_seconds", time.perf_counter() - t0)
+
+# Подпроцессы git: общий лимит одновременных процессов на весь процесс Python
+# (и синхронные вызовы из потоков, и асинхронные) и таймаут на одну команду.
+GIT_TIMEOUT = None  # секунд; None — без ограничения (--git-timeout)
+GIT_MAX_PROCS = 8  # одновременных процессов git (--git-procs)
+_git_sem = None
+_git_sem_lock = _thread.allocate_lock()
+
+def configure_git(timeout: float | None, max_procs: int):
+    global GIT_TIMEOUT, GIT_MAX_PROCS, _git_sem
+    GIT_TIMEOUT = timeout or None
+    GIT_MAX_PROCS = max(1, max_procs)
+    _git_sem = None
+
+def git_slots():
+    global _git_sem
+    with _git_sem_lock:
+        if _git_sem is None:
+            import threading
+            _git_sem = threading.BoundedSemaphore(GIT_MAX_PROCS)
+        return _git_sem
+
+def kill_after(p, timeout: float | None, fired: list):
+    # таймер, убивающий процесс с потоковым выводом; fired[0] = True, если сработал
+    if not timeout:
+        return None
+    import threading
+
+    def kill():
+        fired[0] = True
+        p.kill()
+    t = threading.Timer(timeout, kill)
+    t.daemon = True
+    t.start()
+    return t
+
+def timeout_error(cmd) -> RuntimeError:
+    return RuntimeError(f"Command timed out after {GIT_TIMEOUT:g} s: {' '.join(cmd)}")
+
+def run(cmd, cwd=None, input: str | None = None):
+    import subprocess
+    with git_slots():
+        t0 = time.perf_counter()
+        try:
+            p = subprocess.run(cmd, cwd=cwd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, timeout=GIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            raise timeout_error(cmd)
+        finally:
+            count_git(t0)
     if p.returncode != 0:
         raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{p.stderr.strip()}")
     return p.stdout
@@ -53,7 +200,109 @@ def week_start_monday(d: dt.date) -> dt.date:
 def parse_date(s: str) -> dt.date:
     return dt.date.fromisoformat(s)
 
-def ensure_repo(repo_url: str | None, repo_path: str | None) -> str:
+def remove_tree(path: str):
+    import shutil
+    import stat
+
+    # shutil.rmtree вместо поштучного удаления; файлы объектов git бывают
+    # read-only (Windows), поэтому при ошибке снимаем атрибут и повторяем
+    def on_error(func, p, *_):
+        os.chmod(p, stat.S_IWRITE)
+        func(p)
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=on_error)
+    else:
+        shutil.rmtree(path, onerror=on_error)
+
+def fetch_opts(blobless: bool, since: dt.date | None) -> list:
+    opts = []
+    if blobless:
+        # partial clone: сразу приходят только коммиты и деревья, блобы для numstat
+        # потом забирает prefetch_blobs()
+        opts.append("--filter=blob:none")
+    if since is not None:
+        opts.append(f"--shallow-since={since.isoformat()}")
+    return opts
+
+def depth_opts(git_dir: str, since: dt.date | None) -> list:
+    # Глубина истории для уже существующего клона. Клон, однажды сделанный с
+    # --shallow, сам по себе глубже не станет: обычный fetch границу не двигает.
+    #   полный клон                -> ничего (не укорачиваем историю)
+    #   shallow, since не задан    -> --unshallow, нужна вся история
+    #   shallow, since раньше границы -> --shallow-since, докачиваем недостающее
+    #   shallow, граница уже раньше since -> ничего
+    shallow = os.path.join(git_dir, "shallow")
+    if not os.path.isfile(shallow):
+        return []
+    if since is None:
+        return ["--unshallow"]
+    with open(shallow, encoding="ascii") as fh:
+        roots = fh.read().split()
+    if not roots:
+        return []
+    # --shallow-since режет по дате коммитера, сравниваем с ней же
+    stamps = run(["git", "log", "--no-walk", "--format=%ct", *roots], cwd=git_dir).split()
+    boundary = dt.datetime.fromtimestamp(min(int(t) for t in stamps)).date()
+    if since < boundary:
+        return [f"--shallow-since={since.isoformat()}"]
+    return []
+
+def prefetch_blobs(git_dir: str, since: dt.date):
+    # В partial clone git log/diff --numstat докачивали бы недостающие блобы сами —
+    # отдельным запросом к remote почти на каждый коммит. Поэтому заранее: git log --raw
+    # (ему хватает деревьев) даёт старый и новый блоб каждого изменения за период,
+    # из них отбрасываем уже имеющиеся, остальное забираем одним fetch.
+    want = set()
+    cmd = ["git", "log", "--raw", "--no-abbrev", "--no-renames", "--diff-merges=first-parent",
+           "--format=", f"--since={since.isoformat()}", "HEAD"]
+    for line in iter_lines(cmd, cwd=git_dir):
+        # :100644 100644 <старый sha> <новый sha> M<TAB>путь
+        meta = line.split("\t", 1)[0].split()
+        if len(meta) < 5:
+            continue
+        for mode, sha in ((meta[0][1:], meta[2]), (meta[1], meta[3])):
+            if mode != "160000" and sha.strip("0"):  # не подмодуль и не «файла нет»
+                want.add(sha)
+    if not want:
+        return
+    # --batch-all-objects перечисляет только локальные объекты и ничего не докачивает
+    have = ["git", "cat-file", "--batch-all-objects", "--batch-check=%(objectname)", "--unordered"]
+    for sha in iter_lines(have, cwd=git_dir):
+        want.discard(sha)
+    if want:
+        # так же git докачивает объекты сам, только здесь все блобы одним запросом
+        run(["git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "--quiet", "--no-tags",
+             "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none",
+             "--stdin", "origin"], cwd=git_dir, input="\n".join(sorted(want)) + "\n")
+    count("blobs_prefetched", len(want))
+
+def ensure_mirror(repo_url: str, base: str, name: str, blobless: bool, since: dt.date | None,
+                  log_since: dt.date | None = None) -> str:
+    # постоянный bare-зеркальный клон: между запусками докачиваются только новые объекты
+    mirror = os.path.join(base, "mirrors", name + ".git")
+    if os.path.isfile(os.path.join(mirror, "HEAD")):
+        deepen = depth_opts(mirror, since)
+        run(["git", "fetch", "--prune", *deepen], cwd=mirror)
+        # граница сдвинулась только при --shallow-since
+        new_boundary = any(o.startswith("--shallow-since") for o in deepen)
+    else:
+        if os.path.exists(mirror):
+            remove_tree(mirror)
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+        run(["git", "clone", "--mirror", *fetch_opts(blobless, since), repo_url, mirror], cwd=base)
+        new_boundary = since is not None
+    if new_boundary:
+        # +1 коммит за границей, чтобы первый коммит периода имел родителя и честный дифф
+        run(["git", "fetch", "--deepen=1"], cwd=mirror)
+    if blobless and log_since is not None:
+        prefetch_blobs(mirror, log_since)
+    return mirror
+
+def ensure_repo(repo_url: str | None, repo_path: str | None, name: str = "repo",
+                mirror: bool = False, blobless: bool = False, since: dt.date | None = None,
+                log_since: dt.date | None = None) -> str:
+    # since — граница --shallow; log_since — с какой даты отчёт читает историю
+    # (для --blobless: блобы этого периода докачиваются одним запросом)
     if repo_path:
         rp = os.path.abspath(repo_path)
         if not os.path.isdir(os.path.join(rp, ".git")):
@@ -66,94 +315,881 @@ def ensure_repo(repo_url: str | None, repo_path: str | None) -> str:
 
     base = os.path.abspath("./_repo_tmp")
     os.makedirs(base, exist_ok=True)
-    target = os.path.join(base, "repo")
+    target = os.path.join(base, name)
+
+    if mirror:
+        # рабочая копия — git worktree поверх зеркала, объекты не копируются
+        mdir = ensure_mirror(repo_url, base, name, blobless, since, log_since)
+        rev = run(["git", "rev-parse", "HEAD"], cwd=mdir).strip()
+        if os.path.isfile(os.path.join(target, ".git")):
+            run(["git", "checkout", "--detach", "--force", rev], cwd=target)
+            run(["git", "clean", "-ffdqx"], cwd=target)
+        else:
+            if os.path.exists(target):
+                remove_tree(target)
+            run(["git", "worktree", "prune"], cwd=mdir)
+            run(["git", "worktree", "add", "--detach", "--force", target, rev], cwd=mdir)
+        return target
+
     if os.path.isdir(os.path.join(target, ".git")):
         # update
+        deepen = depth_opts(os.path.join(target, ".git"), since)
+        if deepen:
+            # отдельным вызовом: --unshallow вместе с --all упал бы на втором remote
+            run(["git", "fetch", *deepen], cwd=target)
         run(["git", "fetch", "--all", "--prune"], cwd=target)
+        run(["git", "reset", "--hard", "--quiet", "@{upstream}"], cwd=target)
+        new_boundary = any(o.startswith("--shallow-since") for o in deepen)
     else:
         if os.path.exists(target):
             # remove old junk
-            for root, dirs, files in os.walk(target, topdown=False):
-                for f in files:
-                    try: os.remove(os.path.join(root, f))
-                    except: pass
-                for d in dirs:
-                    try: os.rmdir(os.path.join(root, d))
-                    except: pass
-            try: os.rmdir(target)
-            except: pass
-        run(["git", "clone", "--depth", "999999", repo_url, target], cwd=base)
+            remove_tree(target)
+        run(["git", "clone", *fetch_opts(blobless, since), repo_url, target], cwd=base)
+        new_boundary = since is not None
+    if new_boundary:
+        run(["git", "fetch", "--deepen=1"], cwd=target)
+    if blobless and log_since is not None:
+        prefetch_blobs(target, log_since)
     return target
 
-def commits_per_week(repo_dir: str, start: dt.date, end: dt.date) -> Counter:
-    # ISO date like "2025-12-19 12:34:56 +0300"
-    out = run(["git", "log", "--date=iso-strict", "--pretty=%ad"], cwd=repo_dir)
+# Запись о коммите (namedtuple, а не typing.NamedTuple — typing дорог при старте):
+#   date      — дата автора (%ad), по ней строятся недели
+#   author    — имя автора с учётом .mailmap (%aN)
+#   email     — e-mail автора с учётом .mailmap (%aE)
+#   added     — строк добавлено (бинарные файлы не считаются)
+#   removed   — строк удалено
+#   files     — файлов затронуто
+#   is_merge  — коммит слияния
+#   loc_delta — Counter язык -> +/- строк; только для first-parent цепочки HEAD, иначе None
+Commit = namedtuple("Commit", "date author email added removed files is_merge loc_delta")
+
+def iter_lines(cmd, cwd=None):
+    # Как run(), но stdout читается построчно из пайпа, а не копится в памяти.
+    # Если потребитель прекратил итерацию раньше, процесс завершается.
+    import subprocess
+
+    slots = git_slots()
+    slots.acquire()
+    t0 = time.perf_counter()
+    p = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         text=True, errors="replace")
+    fired = [False]
+    timer = kill_after(p, GIT_TIMEOUT, fired)
+    try:
+        for line in p.stdout:
+            yield line.rstrip("\n")
+        err = p.stderr.read()
+        if p.wait() != 0:
+            if fired[0]:
+                raise timeout_error(cmd)
+            raise RuntimeError(f"Command failed: {' '.join(cmd)}\n{err.strip()}")
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+        p.stdout.close()
+        p.stderr.close()
+        count_git(t0)
+        slots.release()
+
+async def arun(cmd, cwd=None) -> str:
+    # асинхронный run(): тот же лимит процессов и таймаут
+    lines = []
+    async for line in aiter_lines(cmd, cwd=cwd):
+        lines.append(line)
+    return "\n".join(lines)
+
+async def aiter_lines(cmd, cwd=None):
+    # Асинхронный iter_lines(): строки stdout по мере появления, stderr читается
+    # параллельно (иначе git встанет на полном пайпе), таймаут — на всю команду.
+    import asyncio
+    import subprocess
+
+    slots = git_slots()
+    if not slots.acquire(blocking=False):
+        # слоты заняты — ждём в потоке, не опрашивая семафор из цикла событий
+        waiter = asyncio.ensure_future(asyncio.to_thread(slots.acquire))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # поток всё равно дождётся слота: отдаём его, как только получит
+            waiter.add_done_callback(lambda _: slots.release())
+            raise
+    t0 = time.perf_counter()
+    p = timer = None
+    try:
+        p = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, stdout=subprocess.PIPE,
+                                                 stderr=subprocess.PIPE, limit=LOC_BUF_SIZE)
+        err = asyncio.ensure_future(p.stderr.read())
+        fired = [False]
+
+        def kill():
+            fired[0] = True
+            p.kill()
+        # один таймер на команду, а не wait_for() на каждую строку
+        timer = asyncio.get_running_loop().call_later(GIT_TIMEOUT, kill) if GIT_TIMEOUT else None
+        async for raw in p.stdout:
+            yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if await p.wait() != 0:
+            if fired[0]:
+                raise timeout_error(cmd)
+            raise RuntimeError(f"Command failed: {' '.join(cmd)}\n"
+                               f"{(await err).decode('utf-8', errors='replace').strip()}")
+        await err
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if p is not None and p.returncode is None:
+            p.kill()
+            await p.wait()
+        count_git(t0)
+        slots.release()
+
+def numstat_lang_delta(added: str, removed: str, path: str):
+    # (язык, +/- строк) для строки numstat или None, если файл не учитываем
+    if added == "-":  # бинарный файл
+        return None
+    if any(d.lower() in EXCLUDE_DIRS for d in path.split("/")[:-1]):
+        return None
+    lang = lang_of(path)
+    if lang is None:
+        return None
+    return lang, int(added) - int(removed)
+
+def log_cmd(since: dt.date | None = None, mailmap: str | None = None,
+            rev_range: str | None = None) -> list:
+    cmd = ["git", "-c", "core.quotepath=off"]
+    if mailmap:
+        # дополнительный .mailmap поверх того, что лежит в самом репозитории
+        cmd += ["-c", f"mailmap.file={os.path.abspath(mailmap)}"]
+    cmd += [
+        "log", "--no-renames", "--numstat",
+        "--diff-merges=first-parent", "--date=iso-strict",
+        "--pretty=format:@%H %P%x09%ad%x09%aN%x09%aE",
+    ]
+    if since is not None:
+        cmd.append(f"--since={since.isoformat()}")
+    if rev_range is not None:
+        # "old..new" для --watch: только новые коммиты; first-parent цепочка
+        # отслеживается от new так же, как от HEAD
+        cmd.append(rev_range)
+    return cmd
+
+def commit_parser():
+    # Разбор вывода log_cmd() по одной строке: (feed(line), finish() -> [Commit]).
+    # Общий для потокового чтения из iter_lines() и из aiter_lines().
+    commits = []
+    mainline = None  # следующий ожидаемый коммит first-parent цепочки
+    cur = None
+
+    def flush():
+        if cur is not None:
+            commits.append(Commit(*cur))
+
+    def feed(line: str):
+        nonlocal mainline, cur
+        if line.startswith("@"):
+            flush()
+            shas, date, author, email = line[1:].split("\t", 3)
+            sha, *parents = shas.split()
+            on_mainline = mainline is None or sha == mainline
+            if on_mainline:
+                mainline = parents[0] if parents else ""
+            # iso-strict example: 2025-12-19T10:11:12+03:00
+            cur = [dt.datetime.fromisoformat(date).date(), author, email, 0, 0, 0,
+                   len(parents) > 1, Counter() if on_mainline else None]
+            return
+        parts = line.split("\t", 2)
+        if cur is None or len(parts) != 3:
+            return
+        added, removed, path = parts
+        cur[5] += 1
+        if added != "-":
+            cur[3] += int(added)
+            cur[4] += int(removed)
+        if cur[7] is not None:
+            d = numstat_lang_delta(added, removed, path)
+            if d is not None:
+                cur[7][d[0]] += d[1]
+
+    def finish() -> list:
+        flush()
+        return commits
+
+    return feed, finish
+
+def read_commits(repo_dir: str, since: dt.date | None = None, mailmap: str | None = None,
+                 rev_range: str | None = None) -> list:
+    # Единственный проход по истории: git log --numstat читается потоком, а на выходе
+    # компактные записи Commit, из которых строятся все листы. --since отдаёт git'у
+    # ранний останов обхода (по дате коммитера, она не раньше даты автора).
+    # Слияния показываем диффом к первому родителю и по %P отслеживаем first-parent
+    # цепочку HEAD: только её дельты складываются в LOC (иначе изменения веток
+    # посчитались бы дважды — в самих коммитах и в слиянии).
+    feed, finish = commit_parser()
+    for line in iter_lines(log_cmd(since, mailmap, rev_range), cwd=repo_dir):
+        feed(line)
+    return finish()
+
+async def read_commits_async(repo_dir: str, since: dt.date | None = None, mailmap: str | None = None) -> list:
+    feed, finish = commit_parser()
+    async for line in aiter_lines(log_cmd(since, mailmap), cwd=repo_dir):
+        feed(line)
+    return finish()
+
+def commits_per_week(commits: list, start: dt.date, end: dt.date) -> Counter:
     c = Counter()
-    for line in out.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        # iso-strict example: 2025-12-19T10:11:12+03:00
-        d = dt.datetime.fromisoformat(line).date()
-        wk = week_start_monday(d)
+    for cm in commits:
+        wk = week_start_monday(cm.date)
         if start <= wk <= end:
             c[wk] += 1
     return c
 
-def walk_project(repo_dir: str):
-    total_files = 0
-    total_bytes = 0
-    src_files = 0
-    loc_total = 0
-    loc_by_lang = Counter()
-    files_by_lang = Counter()
-    bytes_by_lang = Counter()
+def authors_per_week(commits: list, start: dt.date, end: dt.date):
+    # Один проход, группировка по словарям: O(коммитов). Автор — это e-mail после
+    # .mailmap (без учёта регистра); имя берём самое частое для этого e-mail.
+    # Строки слияний не считаем: их дифф к первому родителю повторяет коммиты ветки.
+    names = defaultdict(Counter)
+    weekly = defaultdict(lambda: [0, 0, 0])  # (неделя, автор) -> [коммиты, +, -]
+    for cm in commits:
+        wk = week_start_monday(cm.date)
+        if not (start <= wk <= end):
+            continue
+        key = (cm.email or cm.author).lower()
+        names[key][cm.author] += 1
+        row = weekly[(wk, key)]
+        row[0] += 1
+        if not cm.is_merge:
+            row[1] += cm.added
+            row[2] += cm.removed
+
+    authors = {
+        key: {"name": cnt.most_common(1)[0][0], "email": key,
+              "commits": 0, "added": 0, "removed": 0, "weeks": 0}
+        for key, cnt in names.items()
+    }
+    for (wk, key), (n, added, removed) in weekly.items():
+        a = authors[key]
+        a["commits"] += n
+        a["added"] += added
+        a["removed"] += removed
+        a["weeks"] += 1
+    return authors, weekly
+
+EMPTY_TREE_CMD = ["git", "hash-object", "-t", "tree", os.devnull]
+
+def head_loc_cmd(empty_tree: str) -> list:
+    # LOC дерева HEAD в тех же единицах, что и numstat: дифф от пустого дерева
+    return ["git", "-c", "core.quotepath=off", "diff", "--no-renames", "--numstat", empty_tree, "HEAD"]
+
+def add_numstat_loc(loc: Counter, line: str):
+    parts = line.split("\t", 2)
+    if len(parts) == 3:
+        d = numstat_lang_delta(*parts)
+        if d is not None:
+            loc[d[0]] += d[1]
 
+def head_loc_by_lang(repo_dir: str) -> Counter:
+    empty_tree = run(EMPTY_TREE_CMD, cwd=repo_dir).strip()
+    loc = Counter()
+    for line in iter_lines(head_loc_cmd(empty_tree), cwd=repo_dir):
+        add_numstat_loc(loc, line)
+    return loc
+
+async def head_loc_by_lang_async(repo_dir: str) -> Counter:
+    empty_tree = (await arun(EMPTY_TREE_CMD, cwd=repo_dir)).strip()
+    loc = Counter()
+    async for line in aiter_lines(head_loc_cmd(empty_tree), cwd=repo_dir):
+        add_numstat_loc(loc, line)
+    return loc
+
+def loc_history(repo_dir: str, commits: list, weeks: list, head_loc: Counter | None = None) -> dict:
+    # LOC по языкам на конец каждой недели. Идём назад от HEAD: LOC недели W равен
+    # LOC HEAD минус дельты first-parent коммитов, сделанных после W. Так хватает
+    # коммитов начиная с --start, и вся история до него не читается.
+    after = defaultdict(Counter)  # неделя -> язык -> +/- строк
+    for cm in commits:
+        if cm.loc_delta:
+            after[week_start_monday(cm.date)].update(cm.loc_delta)
+
+    history = {}
+    loc = Counter(head_loc) if head_loc is not None else head_loc_by_lang(repo_dir)
+    pending = sorted(after, reverse=True)
+    i = 0
+    for w in reversed(weeks):
+        while i < len(pending) and pending[i] > w:
+            loc.subtract(after[pending[i]])
+            i += 1
+        history[w] = Counter({k: v for k, v in loc.items() if v > 0})
+    return {w: history[w] for w in weeks}
+
+SCAN_CHUNK = 256  # файлов на одну задачу пула при --jobs > 1
+LOC_BUF_SIZE = 1 << 20  # буфер чтения для подсчёта строк (1 MB)
+SNIFF_SIZE = 8192  # сколько байт начала файла смотрим, чтобы отличить бинарный/сгенерированный
+MINIFIED_LINE = 1000  # средняя длина строки в начале файла, с которой считаем его минифицированным
+SCAN_CACHE_PATH = os.path.join("_repo_tmp", "scan_cache.sqlite")
+
+def iter_files(repo_dir: str):
     for root, dirs, files in os.walk(repo_dir):
         # prune excluded dirs
         dirs[:] = [d for d in dirs if d.lower() not in EXCLUDE_DIRS]
         for f in files:
-            total_files += 1
-            p = os.path.join(root, f)
-            try:
-                st = os.stat(p)
-            except:
+            if f == ".git":  # файл-указатель worktree/подмодуля
+                continue
+            yield os.path.join(root, f)
+
+def count_lines(path: str, buf_size: int = LOC_BUF_SIZE) -> int:
+    # Считаем b"\n" прямо в байтах, без чтения файла целиком и без decode():
+    # в UTF-8 и latin-1 байт 0x0A встречается только как перевод строки,
+    # так что результат совпадает с text.count("\n") + 1 для непустого текста.
+    # Память ограничена одним буфером buf_size независимо от размера файла.
+    buf = bytearray(buf_size)
+    lines = 0
+    total = 0
+    with open(path, "rb", buffering=0) as fh:
+        while True:
+            n = fh.readinto(buf)
+            if not n:
+                break
+            lines += buf.count(b"\n", 0, n)
+            total += n
+    return lines + (1 if total else 0)
+
+_comment_res = {}
+
+def comment_re(syntax: tuple):
+    # одна регулярка на синтаксис: строчные комментарии до конца строки, блочные —
+    # до закрывающего маркера или до конца куска (тогда блок продолжается дальше)
+    rx = _comment_res.get(syntax)
+    if rx is None:
+        import re
+        line_marks, blocks = syntax
+        alts = [re.escape(m) + rb"[^\n]*" for m in line_marks]
+        alts += [re.escape(b) + rb".*?(?:" + re.escape(e) + rb"|\Z)" for b, e in blocks]
+        rx = _comment_res[syntax] = re.compile(b"|".join(alts), re.S)
+    return rx
+
+def count_blank(text: bytes) -> int:
+    # число пустых (из пробельных символов) строк, завершённых "\n", без цикла по строкам:
+    # выкидываем пробелы, и пустая строка — это "\n" сразу после "\n" (или в начале).
+    # Каждая замена "\n\n" -> "\n.\n" удлиняет текст на байт; двух проходов хватает,
+    # чтобы разбить и серии подряд идущих "\n".
+    t = b"\n" + text.translate(None, b" \t\r\f\v")
+    u = t.replace(b"\n\n", b"\n.\n").replace(b"\n\n", b"\n.\n")
+    return len(u) - len(t)
+
+def classify_lines(path: str, buf_size: int = LOC_BUF_SIZE) -> tuple:
+    # (loc, code, comment, blank) за один потоковый проход, как у cloc: строка с кодом
+    # и комментарием — код, пустые строки внутри блочного комментария — пустые.
+    # Цикла по строкам в Python нет: пустые строки считает count_blank() по всему
+    # куску, комментарии находит одна регулярка, а «только комментарий» проверяется
+    # лишь для строк, которых касается комментарий. loc совпадает с count_lines(),
+    # code + comment + blank == loc. Строковые литералы не разбираются.
+    syntax = COMMENT_SYNTAX.get(os.path.splitext(path)[1].lower())
+    rx = comment_re(syntax) if syntax else None
+    block_end = dict(syntax[1]) if syntax else {}
+    in_block = None  # закрывающий маркер блока, не закрытого в прошлом куске
+
+    def comment_only(text):
+        # число непустых строк куска, в которых кроме комментариев ничего нет
+        nonlocal in_block
+        spans = []
+        pos = 0
+        if in_block is not None:
+            i = text.find(in_block)
+            pos = len(text) if i < 0 else i + len(in_block)
+            spans.append((0, pos))
+            if i >= 0:
+                in_block = None
+        if rx is not None:
+            for m in rx.finditer(text, pos):
+                g = m.group()
+                for b, e in block_end.items():
+                    if g.startswith(b) and not (len(g) >= len(b) + len(e) and g.endswith(e)):
+                        in_block = e
+                spans.append(m.span())
+
+        def line_end(x):
+            return text.find(b"\n", x) + 1 or len(text)
+
+        comment = 0
+        i = 0
+        while i < len(spans):
+            # строки, которых касаются комментарии spans[i..j]: сравниваем число пустых
+            # строк до и после вырезания комментариев (переводы строк сохраняются)
+            start = text.rfind(b"\n", 0, spans[i][0]) + 1
+            end = line_end(spans[i][1])
+            j = i
+            while j + 1 < len(spans) and spans[j + 1][0] < end:
+                j += 1
+                end = line_end(spans[j][1])
+            parts = []
+            cur = start
+            for a, b in spans[i:j + 1]:
+                parts.append(text[cur:a])
+                parts.append(b"\n" * text.count(b"\n", a, b))
+                cur = b
+            parts.append(text[cur:end])
+            comment += count_blank(b"".join(parts)) - count_blank(text[start:end])
+            i = j + 1
+        return comment
+
+    loc = comment = blank = 0
+    buf = bytearray(buf_size)
+    carry = b""
+    total = 0
+    with open(path, "rb", buffering=0) as fh:
+        while True:
+            n = fh.readinto(buf)
+            total += n
+            if n:
+                data = carry + buf[:n]
+                cut = data.rfind(b"\n") + 1
+                text, carry = bytes(data[:cut]), bytes(data[cut:])
+                if not text:
+                    continue  # строка длиннее буфера — копим дальше
+            elif total:
+                # последняя строка без перевода (или пустая после него, как в count_lines)
+                text = carry + b"\n"
+            else:
+                break
+            loc += text.count(b"\n")
+            blank += count_blank(text)
+            comment += comment_only(text)
+            if not n:
+                break
+    return loc, loc - comment - blank, comment, blank
+
+# управляющие байты, которых не бывает в тексте (всё < 0x20, кроме \t \n \v \f \r \x1b)
+_CTRL_BYTES = bytes(b for b in range(32) if b not in b"\t\n\v\f\r\x1b")
+
+def byte_entropy(data: bytes) -> float:
+    # энтропия Шеннона в битах на байт: текст ~4-6, сжатые/шифрованные данные ~8
+    import math
+
+    n = len(data)
+    return -sum(c / n * math.log2(c / n) for c in Counter(data).values())
+
+def name_kind(path: str) -> str | None:
+    # "generated" для lock-файлов, минифицированных бандлов и т.п. — по одному имени
+    name = os.path.basename(path).lower()
+    if name in GENERATED_NAMES or name.endswith(GENERATED_SUFFIXES):
+        return "generated"
+    return None
+
+def sniff_kind(head: bytes) -> str | None:
+    # Вердикт по первым SNIFF_SIZE байтам: "binary", "generated" или None (обычный текст).
+    # Проверки от дешёвых к дорогим; энтропию считаем только для заметного куска.
+    if b"\0" in head:
+        return "binary"
+    if not head:
+        return None
+    ctrl = len(head) - len(head.translate(None, _CTRL_BYTES))
+    if ctrl * 10 > len(head):
+        return "binary"
+    if len(head) >= 1024 and byte_entropy(head) > 7.0:
+        return "binary"
+    low = head[:1024].lower()
+    if any(m in low for m in GENERATED_MARKERS):
+        return "generated"
+    # минифицированный JS/CSS/JSON: килобайты без переводов строк
+    if len(head) >= 4096 and head.count(b"\n") * MINIFIED_LINE < len(head):
+        return "generated"
+    return None
+
+def sniff_file(path: str) -> str | None:
+    # читает не больше SNIFF_SIZE байт; для известных имён не читает ничего
+    kind = name_kind(path)
+    if kind is None:
+        with open(path, "rb", buffering=0) as fh:
+            kind = sniff_kind(fh.read(SNIFF_SIZE))
+    return kind
+
+def lang_of(path: str) -> str | None:
+    # None — бинарный файл (LOC не считаем)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".":  # "file." — без расширения, как у Path.suffix
+        ext = ""
+    if ext in BINARY_EXTS:
+        return None
+    return LANG_BY_EXT.get(ext, ext.upper() if ext else "Other")
+
+def open_cache_db(db_path: str):
+    import sqlite3
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=60)  # в пакетном режиме кэш общий для процессов
+    with con:
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " repo TEXT NOT NULL, path TEXT NOT NULL,"
+            " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " lang TEXT NOT NULL, loc INTEGER NOT NULL,"
+            " PRIMARY KEY (repo, path))"
+        )
+        # Колонки, добавленные позже, — в старые базы дописываем на месте. NULL значит
+        # «ещё не считали»: разбивка LOC (--classify) и вердикт sniff_file()
+        # ("" — текст, "binary", "generated").
+        cols = {row[1] for row in con.execute("PRAGMA table_info(files)")}
+        for col, typ in (("code", "INTEGER"), ("comment", "INTEGER"), ("blank", "INTEGER"),
+                         ("kind", "TEXT")):
+            if col not in cols:
+                con.execute(f"ALTER TABLE files ADD COLUMN {col} {typ}")
+        # LOC по SHA блоба: содержимое адресуется хэшем, поэтому записи не устаревают
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " sha TEXT PRIMARY KEY, size INTEGER NOT NULL, loc INTEGER)"
+        )
+        if "kind" not in {row[1] for row in con.execute("PRAGMA table_info(blobs)")}:
+            con.execute("ALTER TABLE blobs ADD COLUMN kind TEXT")
+    return con
+
+def load_scan_cache(db_path: str, repo_dir: str) -> dict:
+    # {path: (size, mtime_ns, lang, loc, code, comment, blank, kind)} для всех файлов
+    # repo_dir из прошлых запусков
+    con = open_cache_db(db_path)
+    try:
+        rows = con.execute(
+            "SELECT path, size, mtime_ns, lang, loc, code, comment, blank, kind"
+            " FROM files WHERE repo = ?",
+            (repo_dir,),
+        )
+        return {row[0]: row[1:] for row in rows}
+    finally:
+        con.close()
+
+def save_scan_cache(db_path: str, repo_dir: str, old: dict, fresh: dict):
+    # пишем только изменившиеся записи; файлы, которых больше нет, вытесняем
+    stale = [(repo_dir, p) for p in old.keys() - fresh.keys()]
+    changed = [(repo_dir, p, *v) for p, v in fresh.items() if old.get(p) != v]
+    if not stale and not changed:
+        return
+    con = open_cache_db(db_path)
+    try:
+        with con:
+            con.executemany("DELETE FROM files WHERE repo = ? AND path = ?", stale)
+            con.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", changed)
+    finally:
+        con.close()
+
+def load_blob_memo(db_path: str) -> dict:
+    con = open_cache_db(db_path)
+    try:
+        rows = con.execute("SELECT sha, size, loc, kind FROM blobs")
+        return {sha: (size, loc, kind) for sha, size, loc, kind in rows}
+    finally:
+        con.close()
+
+def save_blob_memo(db_path: str, new_blobs: dict):
+    if not new_blobs:
+        return
+    con = open_cache_db(db_path)
+    try:
+        with con:
+            con.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)",
+                [(sha, *v) for sha, v in new_blobs.items()],
+            )
+    finally:
+        con.close()
+
+def git_ls_files(repo_dir: str) -> list:
+    # [(path, sha)] по индексу; .gitignore учитывает сам git, подмодули пропускаем
+    entries = {}
+    for rec in run(["git", "ls-files", "-s", "-z"], cwd=repo_dir).split("\0"):
+        if not rec:
+            continue
+        meta, path = rec.split("\t", 1)
+        mode, sha, _stage = meta.split()
+        if mode == "160000":
+            continue
+        entries.setdefault(path, sha)
+    return list(entries.items())
+
+def git_blob_info(repo_dir: str, shas: list, with_loc: bool) -> dict:
+    # {sha: (size, loc, kind)} через один процесс git cat-file; содержимое читается потоком
+    # кусками по LOC_BUF_SIZE, так что в памяти не держим ни одного блоба целиком.
+    # kind — sniff_kind() начала блоба ("" для текста); без with_loc loc и kind — None.
+    import subprocess
+    import threading
+
+    if not shas:
+        return {}
+    cmd = ["git", "cat-file", "--batch" if with_loc else "--batch-check"]
+    slots = git_slots()
+    slots.acquire()
+    t0 = time.perf_counter()
+    p = subprocess.Popen(cmd, cwd=repo_dir, stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    fired = [False]
+    timer = kill_after(p, GIT_TIMEOUT, fired)
+
+    # пишем запросы из отдельного потока, иначе git заблокируется на полном stdout
+    def feed():
+        try:
+            with p.stdin:
+                for sha in shas:
+                    p.stdin.write(sha.encode() + b"\n")
+        except OSError:
+            pass  # git уже завершился (таймаут) — об этом скажет код возврата
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+
+    info = {}
+    try:
+        out = p.stdout
+        for _ in shas:
+            header = out.readline().split()
+            if len(header) < 3:  # "<sha> missing"
                 continue
-            total_bytes += st.st_size
+            sha, size = header[0].decode(), int(header[2])
+            loc = kind = None
+            if with_loc:
+                lines = 0
+                left = size
+                kind = ""
+                while left:
+                    chunk = out.read(min(left, LOC_BUF_SIZE))
+                    if not chunk:
+                        break
+                    if left == size:
+                        kind = sniff_kind(chunk[:SNIFF_SIZE]) or ""
+                    lines += chunk.count(b"\n")
+                    left -= len(chunk)
+                out.read(1)  # перевод строки после содержимого
+                loc = lines + (1 if size else 0)
+            info[sha] = (size, loc, kind)
+        writer.join()
+        rc = p.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+        p.stdout.close()
+        count_git(t0)
+        slots.release()
+    if rc != 0:
+        if fired[0]:
+            raise timeout_error(cmd)
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}")
+    return info
 
-            ext = Path(f).suffix.lower()
-            if ext in BINARY_EXTS:
+def walk_git_project(repo_dir: str, cache_path: str | None = None, details: bool = False,
+                     sniff: bool = True, blob_memo: dict | None = None):
+    # Файлы берём из git ls-files -s, а LOC — по SHA блоба: одинаковое содержимое
+    # по разным путям и между запусками считается один раз. Размеры и LOC относятся
+    # к содержимому индекса (для свежего клона совпадает с рабочей копией).
+    # blob_memo — тот же memo в памяти между вызовами (--watch), пополняется на месте.
+    entries = git_ls_files(repo_dir)
+    if blob_memo is not None:
+        if not blob_memo and cache_path:
+            blob_memo.update(load_blob_memo(cache_path))
+        memo = blob_memo
+    else:
+        memo = load_blob_memo(cache_path) if cache_path else {}
+
+    need_loc, need_size = set(), set()
+    for path, sha in entries:
+        known = memo.get(sha)
+        if lang_of(path) is not None:
+            if known is None or known[1] is None or (sniff and known[2] is None):
+                need_loc.add(sha)
+        elif known is None:
+            need_size.add(sha)
+    need_size -= need_loc
+
+    new_blobs = git_blob_info(repo_dir, sorted(need_loc), with_loc=True)
+    new_blobs.update(git_blob_info(repo_dir, sorted(need_size), with_loc=False))
+    memo.update(new_blobs)
+
+    stats = new_stats(details, sniff=sniff)
+    stats["files_read"] = len(need_loc)
+    stats["bytes_read"] = sum(new_blobs[sha][0] for sha in need_loc if sha in new_blobs)
+    for path, sha in entries:
+        stats["total_files"] += 1
+        if sha not in memo:
+            continue
+        size, loc, kind = memo[sha]
+        stats["total_bytes"] += size
+
+        lang = lang_of(path)
+        if lang is None:
+            continue
+        if sniff:
+            kind = name_kind(path) or kind
+            if kind:
+                stats[f"{kind}_files"] += 1
                 continue
+        stats["src_files"] += 1
+        stats["bytes_by_lang"][lang] += size
+        stats["files_by_lang"][lang] += 1
+        stats["loc_total"] += loc
+        stats["loc_by_lang"][lang] += loc
+        if details:
+            stats["files"].append((path, lang, size, loc))
+
+    if cache_path:
+        save_blob_memo(cache_path, new_blobs)
+    return stats
+
+def new_stats(details: bool = False, classify: bool = False, sniff: bool = False) -> dict:
+    stats = {
+        "total_files": 0,
+        "total_bytes": 0,
+        "src_files": 0,
+        "loc_total": 0,
+        "loc_by_lang": Counter(),
+        "files_by_lang": Counter(),
+        "bytes_by_lang": Counter(),
+        # для --stats: сколько файлов/блобов реально читали (промахи кэша)
+        "files_sniffed": 0,
+        "files_read": 0,
+        "bytes_read": 0,
+    }
+    if sniff:
+        # файлы с текстовым расширением, которые sniff_file() исключил из LOC
+        stats["binary_files"] = 0
+        stats["generated_files"] = 0
+    if classify:
+        stats["code_by_lang"] = Counter()
+        stats["comment_by_lang"] = Counter()
+        stats["blank_by_lang"] = Counter()
+    if details:
+        # (путь, язык, размер, LOC[, код, комментарии, пустые]) для листа «Файлы»
+        stats["files"] = []
+    return stats
+
+def merge_stats(dst: dict, src: dict) -> dict:
+    for k, v in src.items():
+        if isinstance(v, Counter):
+            # update(), а не "+": сохраняем языки с нулевым LOC, как в последовательном проходе
+            dst[k].update(v)
+        else:
+            dst[k] += v
+    return dst
+
+def scan_files(paths, cache: dict | None = None, fresh: dict | None = None,
+               root: str | None = None, classify: bool = False, sniff: bool = True) -> dict:
+    # root задан — собираем ещё и построчную детализацию с путями относительно root;
+    # classify — вместо простого подсчёта строк делим их на код/комментарии/пустые;
+    # sniff — бинарные и сгенерированные файлы (по началу содержимого) в LOC не идут
+    stats = new_stats(details=root is not None, classify=classify, sniff=sniff)
+    loc_by_lang = stats["loc_by_lang"]
+    files_by_lang = stats["files_by_lang"]
+    bytes_by_lang = stats["bytes_by_lang"]
+
+    for p in paths:
+        stats["total_files"] += 1
+        try:
+            st = os.stat(p)
+        except:
+            continue
+        stats["total_bytes"] += st.st_size
+
+        lang = lang_of(p)
+        if lang is None:
+            continue
+
+        # вердикт и LOC: файл читаем, только если (size, mtime) не совпали с кэшем
+        key = (st.st_size, st.st_mtime_ns)
+        hit = cache.get(p) if cache is not None else None
+        if hit is not None and hit[:2] != key:
+            hit = None
+        kind = hit[7] if hit is not None else None
+        if sniff and kind is None:
+            stats["files_sniffed"] += 1
+            try:
+                kind = sniff_file(p) or ""
+            except OSError:
+                pass
+        if sniff and kind:
+            stats[f"{kind}_files"] += 1
+            if fresh is not None:
+                # LOC, посчитанный прогоном с --no-sniff, не затираем
+                counted = hit[3:7] if hit is not None else (0, None, None, None)
+                fresh[p] = (*key, lang, *counted, kind)
+            continue
 
-            # treat as source/text
-            src_files += 1
-            lang = LANG_BY_EXT.get(ext, ext.upper() if ext else "Other")
-            bytes_by_lang[lang] += st.st_size
-            files_by_lang[lang] += 1
+        # treat as source/text
+        stats["src_files"] += 1
+        bytes_by_lang[lang] += st.st_size
+        files_by_lang[lang] += 1
 
-            # LOC
+        # у файлов, которые sniff исключил, loc = 0 значит «не считали»; с --no-sniff
+        # годится и их LOC, если его уже посчитал прошлый прогон без sniff
+        counted = hit is not None and (not hit[7] or (not sniff and hit[3] > 0))
+        kinds = (None, None, None)
+        if counted and (not classify or hit[4] is not None):
+            loc, kinds = hit[3], hit[4:7]
+        else:
+            stats["files_read"] += 1
+            stats["bytes_read"] += st.st_size
             try:
-                with open(p, "rb") as fh:
-                    b = fh.read()
-                try:
-                    text = b.decode("utf-8")
-                except UnicodeDecodeError:
-                    text = b.decode("latin-1", errors="replace")
-                loc = text.count("\n") + (1 if text else 0)
-            except:
-                loc = 0
-            loc_total += loc
-            loc_by_lang[lang] += loc
+                if classify:
+                    loc, *kinds = classify_lines(p)
+                else:
+                    loc = count_lines(p)
+            except OSError:
+                loc = None
+        if loc is None:
+            loc = 0
+            kinds = (0, 0, 0)
+        elif fresh is not None:
+            fresh[p] = (*key, lang, loc, *kinds, kind)
+        stats["loc_total"] += loc
+        loc_by_lang[lang] += loc
+        if classify:
+            code, comment, blank = kinds
+            stats["code_by_lang"][lang] += code
+            stats["comment_by_lang"][lang] += comment
+            stats["blank_by_lang"][lang] += blank
+        if root is not None:
+            row = (os.path.relpath(p, root), lang, st.st_size, loc)
+            stats["files"].append(row + tuple(kinds) if classify else row)
 
-    return {
-        "total_files": total_files,
-        "total_bytes": total_bytes,
-        "src_files": src_files,
-        "loc_total": loc_total,
-        "loc_by_lang": loc_by_lang,
-        "files_by_lang": files_by_lang,
-        "bytes_by_lang": bytes_by_lang,
-    }
+    return stats
+
+def walk_project(repo_dir: str, jobs: int = 1, cache_path: str | None = None, details: bool = False,
+                 classify: bool = False, sniff: bool = True, memo: dict | None = None):
+    # memo — кэш сканирования в памяти между вызовами (--watch): записи как у
+    # load_scan_cache(); после прохода в нём ровно текущие файлы. SQLite тогда
+    # читается только при первом вызове, а пишется, как обычно, только разница.
+    repo_key = os.path.abspath(repo_dir)
+    if memo:
+        cache = memo
+    else:
+        cache = load_scan_cache(cache_path, repo_key) if cache_path else None
+    fresh = {} if cache_path or memo is not None else None
+    root = repo_dir if details else None
+
+    if jobs <= 1:
+        stats = scan_files(iter_files(repo_dir), cache, fresh, root, classify, sniff)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # Обход каталогов дешёвый и остаётся в основном потоке (детерминированный порядок),
+        # а stat + чтение файлов раздаются пачками в пул потоков: ввод-вывод отпускает GIL.
+        # map() возвращает результаты в порядке пачек, поэтому слияние даёт те же Counter'ы
+        # (включая порядок ключей), что и последовательный проход.
+        paths = list(iter_files(repo_dir))
+        chunks = [paths[i:i + SCAN_CHUNK] for i in range(0, len(paths), SCAN_CHUNK)]
+        stats = new_stats(details, classify, sniff)
+        with ThreadPoolExecutor(max_workers=jobs) as ex:
+            for part in ex.map(lambda chunk: scan_files(chunk, cache, fresh, root, classify, sniff),
+                               chunks):
+                merge_stats(stats, part)
+
+    if cache_path:
+        save_scan_cache(cache_path, repo_key, cache, fresh)
+    if memo is not None:
+        memo.clear()
+        memo.update(fresh)
+    return stats
 
 def build_weeks(start: dt.date, end: dt.date):
     w = week_start_monday(start)
@@ -164,50 +1200,165 @@ def build_weeks(start: dt.date, end: dt.date):
         w += dt.timedelta(days=7)
     return weeks
 
+def update_commits(repo_dir: str, since: dt.date, mailmap: str | None, state: dict):
+    # --watch: история и LOC HEAD хранятся в state между проходами. Если HEAD не
+    # сдвинулся — git log не запускаем; если старый HEAD лежит на first-parent цепочке
+    # нового (обычный push/pull) — читаем только old..HEAD, а LOC HEAD получаем из
+    # старого плюс дельты новых коммитов цепочки. Иначе (force push, смена ветки,
+    # слияние, где старый HEAD стал вторым родителем) — полное перечитывание.
+    head = run(["git", "rev-parse", "HEAD"], cwd=repo_dir).strip()
+    old = state.get("head")
+    if old == head:
+        return
+    chain = []
+    if old is not None:
+        # "<sha> <родители>" от HEAD вниз; цепочка дошла до old, если он — первый
+        # родитель последнего коммита
+        chain = run(["git", "rev-list", "--first-parent", "--parents", f"{old}..{head}"],
+                    cwd=repo_dir).split("\n")
+        chain = [line.split() for line in chain if line]
+    if chain and len(chain[-1]) > 1 and chain[-1][1] == old:
+        new = read_commits(repo_dir, since=since, mailmap=mailmap, rev_range=f"{old}..{head}")
+        head_loc = Counter(state["head_loc"])
+        for cm in new:
+            if cm.loc_delta:
+                head_loc.update(cm.loc_delta)
+        state["commits"] = new + state["commits"]
+        state["head_loc"] = head_loc
+    else:
+        state["commits"] = read_commits(repo_dir, since=since, mailmap=mailmap)
+        state["head_loc"] = head_loc_by_lang(repo_dir)
+    state["head"] = head
+
+def scan_repo(repo_dir: str, args, state: dict | None = None) -> dict:
+    cache_path = None if args.no_cache else args.cache
+    if args.git_scan:
+        return walk_git_project(repo_dir, cache_path=cache_path, details=args.details,
+                                sniff=not args.no_sniff,
+                                blob_memo=state.setdefault("blobs", {}) if state is not None else None)
+    return walk_project(repo_dir, jobs=args.jobs, cache_path=cache_path, details=args.details,
+                        classify=args.classify, sniff=not args.no_sniff,
+                        memo=state.setdefault("scan", {}) if state is not None else None)
+
+async def gather_sources(repo_dir: str, since: dt.date, args):
+    # git log, LOC HEAD (git diff) и обход файлов друг от друга не зависят — запускаем
+    # одновременно: два потока вывода git читаются в цикле событий, сканирование идёт
+    # в потоке. Фазы в DIAG при этом перекрываются, их сумма больше времени прохода.
+    import asyncio
+
+    async def timed(name, aw):
+        DIAG["phases"].setdefault(name, 0.0)
+        t0 = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            add_phase(name, time.perf_counter() - t0)
+
+    return await asyncio.gather(
+        timed("read_commits", read_commits_async(repo_dir, since=since, mailmap=args.mailmap)),
+        timed("head_loc_by_lang", head_loc_by_lang_async(repo_dir)),
+        timed("walk_git_project" if args.git_scan else "walk_project",
+              asyncio.to_thread(scan_repo, repo_dir, args)),
+    )
+
+def collect_report(repo_dir: str, start: dt.date, end: dt.date, args, state: dict | None = None) -> dict:
+    # state — состояние между проходами --watch (история, кэш сканирования в памяти)
+    weeks = build_weeks(start, end)
+    if state is None:
+        import asyncio
+
+        commits, head_loc, stats = asyncio.run(gather_sources(repo_dir, week_start_monday(start), args))
+    else:
+        with phase("read_commits"):
+            update_commits(repo_dir, week_start_monday(start), args.mailmap, state)
+            commits, head_loc = state["commits"], state["head_loc"]
+        with phase("walk_git_project" if args.git_scan else "walk_project"):
+            stats = scan_repo(repo_dir, args, state)
+    with phase("commits_per_week"):
+        weekly_commits = commits_per_week(commits, week_start_monday(start), week_start_monday(end))
+        authors, author_weeks = authors_per_week(commits, week_start_monday(start), week_start_monday(end))
+    with phase("loc_history"):
+        history = loc_history(repo_dir, commits, weeks, head_loc=head_loc)
+    count("commits", len(commits))
+    count("files_scanned", stats["total_files"])
+    for k in ("files_sniffed", "files_read", "bytes_read"):
+        count(k, stats[k])
+    report = {
+        "weeks": weeks,
+        "weekly_commits": weekly_commits,
+        "stats": stats,
+        "history": history,
+        "authors": authors,
+        "author_weeks": author_weeks,
+    }
+    if args.details:
+        report["commits"] = commits
+    if args.stats:
+        # живая ссылка: писатели отчёта добавят в неё и свои фазы
+        report["diagnostics"] = DIAG
+    return report
+
 def style_header(row):
+    from openpyxl.styles import Font, Alignment, PatternFill
     for cell in row:
         cell.font = Font(bold=True)
         cell.fill = PatternFill("solid", fgColor="E6EEF8")
         cell.alignment = Alignment(horizontal="center")
+    return row
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--repo-url", default=None)
-    ap.add_argument("--repo-path", default=None)
-    ap.add_argument("--out", required=True)
-    ap.add_argument("--start", required=True, help="YYYY-MM-DD (например 2025-09-01)")
-    ap.add_argument("--end", required=True, help="YYYY-MM-DD (например 2025-12-31)")
-    args = ap.parse_args()
+# Листы пишутся только через ws.append(): так один и тот же код работает и с обычной
+# книгой, и с write-only (потоковой), где строки сразу уходят на диск.
 
-    start = parse_date(args.start)
-    end = parse_date(args.end)
-    weeks = build_weeks(start, end)
+def header_row(ws, values):
+    from openpyxl.cell import WriteOnlyCell
+    return style_header([WriteOnlyCell(ws, value=v) for v in values])
+
+def bold_cell(ws, value, size=None):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    c = WriteOnlyCell(ws, value=value)
+    c.font = Font(bold=True, size=size)
+    return c
 
-    repo_dir = ensure_repo(args.repo_url, args.repo_path)
+def append_title(ws, text: str, ncols: int):
+    ws.append([bold_cell(ws, text, size=14)])
+    if hasattr(ws, "merge_cells"):  # в write-only листе объединения ячеек нет
+        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=ncols)
 
-    weekly_commits = commits_per_week(repo_dir, week_start_monday(start), week_start_monday(end))
-    stats = walk_project(repo_dir)
+def set_widths(ws, widths: dict):
+    # в write-only режиме ширины нужно задать до первой строки
+    for col, w in widths.items():
+        ws.column_dimensions[col].width = w
 
-    wb = Workbook()
+def write_xlsx(report: dict, out: str, streaming: bool = False):
+    # openpyxl импортируется только здесь: для json/csv/parquet он не нужен вовсе
+    from openpyxl import Workbook
+    from openpyxl.chart import BarChart, LineChart, PieChart, Reference
+    from openpyxl.chart.label import DataLabelList
+    from openpyxl.utils import get_column_letter
+
+    weeks = report["weeks"]
+    weekly_commits = report["weekly_commits"]
+    stats = report["stats"]
+    history = report["history"]
+    authors = report["authors"]
+    author_weeks = report["author_weeks"]
+
+    wb = Workbook(write_only=streaming)
+    if not streaming:
+        wb.remove(wb.active)
 
     # Sheet 1: weekly activity
-    ws = wb.active
-    ws.title = "Активность (недели)"
-    ws["A1"] = "Активность по написанию кода (коммиты в git по неделям)"
-    ws["A1"].font = Font(bold=True, size=14)
-    ws.merge_cells("A1:C1")
+    ws = wb.create_sheet("Активность (недели)")
+    set_widths(ws, {"A": 14, "B": 14, "C": 40})
+    ws.freeze_panes = "A3"
+    append_title(ws, "Активность по написанию кода (коммиты в git по неделям)", 3)
 
-    ws.append(["Неделя (пн)", "Коммитов (шт)", "Комментарий"])
-    style_header(ws[2])
+    ws.append(header_row(ws, ["Неделя (пн)", "Коммитов (шт)", "Комментарий"]))
 
     for wk in weeks:
         ws.append([wk.isoformat(), int(weekly_commits[wk]), ""])
 
-    ws.column_dimensions["A"].width = 14
-    ws.column_dimensions["B"].width = 14
-    ws.column_dimensions["C"].width = 40
-    ws.freeze_panes = "A3"
-
     chart = BarChart()
     chart.title = "Коммиты по неделям"
     chart.y_axis.title = "Коммиты"
@@ -221,38 +1372,41 @@ def main():
     ws.add_chart(chart, "E2")
 
     # Sheet 2: project size
-    ws2 = wb.create_sheet("Объем проекта")
-    ws2["A1"] = "Объем проекта"
-    ws2["A1"].font = Font(bold=True, size=14)
-    ws2.merge_cells("A1:D1")
-
-    ws2.append(["Метрика", "Значение"])
-    style_header(ws2[2])
+    classified = "code_by_lang" in stats
+    lang_header = ["Язык/тип", "Файлов", "LOC", "Размер (KB)"]
+    summary = [
+        ["Всего файлов (включая всё)", stats["total_files"]],
+        ["Размер репозитория (MB)", round(stats["total_bytes"]/1024/1024, 2)],
+        ["Файлов текста/кода (без bin/obj/.vs/...)", stats["src_files"]],
+        ["LOC (строк)", stats["loc_total"]],
+    ]
+    if classified:
+        lang_header += ["Код", "Комментарии", "Пустые"]
+        summary += [
+            ["  из них код", sum(stats["code_by_lang"].values())],
+            ["  из них комментарии", sum(stats["comment_by_lang"].values())],
+            ["  из них пустые", sum(stats["blank_by_lang"].values())],
+        ]
+    if "binary_files" in stats:
+        summary += [
+            ["Бинарных по содержимому (не в LOC)", stats["binary_files"]],
+            ["Сгенерированных (не в LOC)", stats["generated_files"]],
+        ]
+    ntable = len(lang_header)
 
-    ws2.append(["Всего файлов (включая всё)", stats["total_files"]])
-    ws2.append(["Размер репозитория (MB)", round(stats["total_bytes"]/1024/1024, 2)])
-    ws2.append(["Файлов текста/кода (без bin/obj/.vs/...)", stats["src_files"]])
-    ws2.append(["LOC (строк)", stats["loc_total"]])
+    ws2 = wb.create_sheet("Объем проекта")
+    set_widths(ws2, {"A": 40, "B": 18})
+    append_title(ws2, "Объем проекта", ntable)
 
-    ws2.column_dimensions["A"].width = 40
-    ws2.column_dimensions["B"].width = 18
+    ws2.append(header_row(ws2, ["Метрика", "Значение"] + [None] * (ntable - 2)))
+    for row in summary:
+        ws2.append(row)
 
     ws2.append([])
-    ws2.append(["Разбивка по типам", "", "", ""])
-    ws2["A8"].font = Font(bold=True)
-
-    ws2.append(["Язык/тип", "Файлов", "LOC", "Размер (KB)"])
-    style_header(ws2[9])
+    ws2.append([bold_cell(ws2, "Разбивка по типам")] + [""] * (ntable - 1))
 
     # sort by LOC desc
     langs = sorted(stats["loc_by_lang"].items(), key=lambda x: x[1], reverse=True)
-    for lang, loc in langs:
-        ws2.append([
-            lang,
-            int(stats["files_by_lang"][lang]),
-            int(loc),
-            round(stats["bytes_by_lang"][lang]/1024, 1)
-        ])
 
     # Pie chart for LOC (top 8 + others)
     loc_items = [(k,v) for k,v in stats["loc_by_lang"].items() if v > 0]
@@ -261,15 +1415,28 @@ def main():
     others = sum(v for _,v in loc_items[8:])
     pie_rows = top + ([("Others", others)] if others > 0 else [])
 
-    base_row = 9
-    base_col = 6
-    ws2.cell(row=base_row, column=base_col, value="Категория").font = Font(bold=True)
-    ws2.cell(row=base_row, column=base_col+1, value="LOC").font = Font(bold=True)
-    r = base_row + 1
-    for k,v in pie_rows:
-        ws2.cell(row=r, column=base_col, value=k)
-        ws2.cell(row=r, column=base_col+1, value=int(v))
-        r += 1
+    # таблица по типам (A:D, с --classify A:G) и данные диаграммы (через колонку правее)
+    # идут в одних и тех же строках
+    base_row = 2 + len(summary) + 3
+    base_col = ntable + 2
+    ws2.append(header_row(ws2, lang_header)
+               + [None, bold_cell(ws2, "Категория"), bold_cell(ws2, "LOC")])
+    for lang_row, pie_row in zip_longest(langs, pie_rows):
+        row = [None] * ntable
+        if lang_row:
+            lang, loc = lang_row
+            row = [
+                lang,
+                int(stats["files_by_lang"][lang]),
+                int(loc),
+                round(stats["bytes_by_lang"][lang]/1024, 1)
+            ]
+            if classified:
+                row += [int(stats[k][lang]) for k in ("code_by_lang", "comment_by_lang", "blank_by_lang")]
+        if pie_row:
+            row += [None, pie_row[0], int(pie_row[1])]
+        ws2.append(row)
+    r = base_row + 1 + len(pie_rows)
 
     pie = PieChart()
     pie.title = "Доля LOC по типам"
@@ -281,10 +1448,647 @@ def main():
     pie.dataLabels.showPercent = True
     pie.height = 12
     pie.width = 18
-    ws2.add_chart(pie, "F2")
+    ws2.add_chart(pie, f"{get_column_letter(base_col)}2")
+
+    # Sheet 3: LOC over time
+    ws3 = wb.create_sheet("Динамика LOC")
+
+    # top 8 по последней неделе + Others, как в круговой диаграмме
+    last = history[weeks[-1]] if weeks else Counter()
+    hist_langs = [k for k, _ in last.most_common(8)]
+    has_others = len(last) > len(hist_langs)
+    header = ["Неделя (пн)"] + hist_langs + (["Others"] if has_others else []) + ["Всего"]
+    ncols = len(header)
+
+    set_widths(ws3, {get_column_letter(col): 14 for col in range(1, ncols + 1)})
+    ws3.freeze_panes = "B3"
+    append_title(ws3, "LOC по языкам на конец недели (по git log --numstat)", max(ncols, 3))
+    ws3.append(header_row(ws3, header))
+
+    for wk in weeks:
+        loc = history[wk]
+        row = [wk.isoformat()] + [int(loc[k]) for k in hist_langs]
+        if has_others:
+            row.append(int(sum(v for k, v in loc.items() if k not in hist_langs)))
+        row.append(int(sum(loc.values())))
+        ws3.append(row)
+
+    line = LineChart()
+    line.title = "LOC по неделям"
+    line.y_axis.title = "LOC"
+    line.x_axis.title = "Неделя"
+    data = Reference(ws3, min_col=2, max_col=ncols, min_row=2, max_row=2+len(weeks))
+    cats = Reference(ws3, min_col=1, min_row=3, max_row=2+len(weeks))
+    line.add_data(data, titles_from_data=True)
+    line.set_categories(cats)
+    line.height = 12
+    line.width = 24
+    ws3.add_chart(line, f"{get_column_letter(ncols + 2)}2")
+
+    # Sheet 4: authors
+    ws4 = wb.create_sheet("Авторы")
+    set_widths(ws4, {"A": 24, "B": 30, "C": 14, "D": 14, "E": 14, "F": 14})
+    append_title(ws4, "Вклад авторов (коммиты и строки в git)", 6)
+
+    ws4.append(header_row(ws4, ["Автор", "E-mail", "Коммитов", "Строк +", "Строк −", "Активных недель"]))
+
+    ranked = sorted(authors.values(), key=lambda a: (-a["commits"], a["name"]))
+    for a in ranked:
+        ws4.append([a["name"], a["email"], a["commits"], a["added"], a["removed"], a["weeks"]])
+
+    # коммиты по неделям: top 8 авторов + Others (источник для диаграммы)
+    chart_authors = [a["email"] for a in ranked[:8]]
+    has_others = len(ranked) > len(chart_authors)
+    week_totals = Counter()
+    for (wk, _), (n, _, _) in author_weeks.items():
+        week_totals[wk] += n
+    pivot_row = 2 + len(ranked) + 3
+    ws4.append([])
+    ws4.append([bold_cell(ws4, "Коммиты по неделям")])
+    header = ["Неделя (пн)"] + [authors[k]["name"] for k in chart_authors] + (["Others"] if has_others else [])
+    ws4.append(header_row(ws4, header))
+
+    for wk in weeks:
+        counts = [author_weeks[(wk, k)][0] if (wk, k) in author_weeks else 0 for k in chart_authors]
+        row = [wk.isoformat()] + counts
+        if has_others:
+            row.append(week_totals[wk] - sum(counts))
+        ws4.append(row)
+
+    stacked = BarChart()
+    stacked.type = "col"
+    stacked.grouping = "stacked"
+    stacked.overlap = 100
+    stacked.title = "Коммиты по неделям и авторам"
+    stacked.y_axis.title = "Коммиты"
+    stacked.x_axis.title = "Неделя"
+    data = Reference(ws4, min_col=2, max_col=len(header), min_row=pivot_row, max_row=pivot_row+len(weeks))
+    cats = Reference(ws4, min_col=1, min_row=pivot_row+1, max_row=pivot_row+len(weeks))
+    stacked.add_data(data, titles_from_data=True)
+    stacked.set_categories(cats)
+    stacked.height = 10
+    stacked.width = 24
+    ws4.add_chart(stacked, "H2")
+
+    # детализация автор × неделя (только непустые пары)
+    ws4.append([])
+    ws4.append([bold_cell(ws4, "Автор × неделя")])
+    ws4.append(header_row(ws4, ["Неделя (пн)", "Автор", "Коммитов", "Строк +", "Строк −"]))
+    for (wk, key), (n, added, removed) in sorted(author_weeks.items()):
+        ws4.append([wk.isoformat(), authors[key]["name"], n, added, removed])
+
+    # Detail sheets (--details): сотни тысяч строк. Сами строки уже лежат в отчёте
+    # (stats["files"], report["commits"] — из них же считаются остальные листы),
+    # --streaming лишь не держит поверх них ещё и ячейки openpyxl
+    if "files" in stats:
+        ws5 = wb.create_sheet("Файлы")
+        set_widths(ws5, {"A": 80, "B": 20, "C": 14, "D": 14,
+                         **({"E": 14, "F": 14, "G": 14} if classified else {})})
+        ws5.freeze_panes = "A2"
+        ws5.append(header_row(ws5, ["Путь", "Язык/тип", "Размер (KB)", "LOC"]
+                              + (["Код", "Комментарии", "Пустые"] if classified else [])))
+        for path, lang, size, *counts in stats["files"]:
+            ws5.append([path, lang, round(size/1024, 1), *counts])
+
+    if "commits" in report:
+        first, last_wk = (weeks[0], weeks[-1]) if weeks else (None, None)
+        ws6 = wb.create_sheet("Коммиты")
+        set_widths(ws6, {"A": 12, "B": 24, "C": 30, "D": 12, "E": 12, "F": 12, "G": 10})
+        ws6.freeze_panes = "A2"
+        ws6.append(header_row(ws6, ["Дата", "Автор", "E-mail", "Строк +", "Строк −", "Файлов", "Слияние"]))
+        for cm in report["commits"]:
+            if first is not None and first <= week_start_monday(cm.date) <= last_wk:
+                ws6.append([cm.date.isoformat(), cm.author, cm.email, cm.added, cm.removed,
+                            cm.files, "да" if cm.is_merge else ""])
+
+    # --stats: фазы до записи книги (сама запись видна только в выводе в консоль)
+    if "diagnostics" in report:
+        ws7 = wb.create_sheet("Диагностика")
+        set_widths(ws7, {"A": 12, "B": 30, "C": 14})
+        ws7.freeze_panes = "A2"
+        ws7.append(header_row(ws7, ["Раздел", "Показатель", "Значение"]))
+        for row in diag_rows(report["diagnostics"]):
+            ws7.append(list(row))
+
+    with phase("wb.save"):
+        wb.save(out)
+
+def report_tables(report: dict) -> dict:
+    # Те же данные, что и в xlsx, в виде плоских таблиц {имя: (колонки, строки)}
+    # для json/csv/parquet. Недели и даты — ISO-строки.
+    weeks = report["weeks"]
+    stats = report["stats"]
+    authors = report["authors"]
+    kinds = ["code", "comment", "blank"] if "code_by_lang" in stats else []
+    tables = {
+        "summary": (["metric", "value"], [
+            ("total_files", stats["total_files"]),
+            ("total_bytes", stats["total_bytes"]),
+            ("src_files", stats["src_files"]),
+            ("loc_total", stats["loc_total"]),
+        ] + [(k, stats[k]) for k in ("binary_files", "generated_files") if k in stats] + [(f"loc_{k}", sum(stats[f"{k}_by_lang"].values())) for k in kinds]),
+        "weeks": (["week", "commits"], [
+            (wk.isoformat(), int(report["weekly_commits"][wk])) for wk in weeks
+        ]),
+        "languages": (["lang", "files", "loc", "bytes"] + kinds, [
+            (lang, int(stats["files_by_lang"][lang]), int(loc), int(stats["bytes_by_lang"][lang]),
+             *(int(stats[f"{k}_by_lang"][lang]) for k in kinds))
+            for lang, loc in sorted(stats["loc_by_lang"].items(), key=lambda x: x[1], reverse=True)
+        ]),
+        "loc_history": (["week", "lang", "loc"], [
+            (wk.isoformat(), lang, int(loc))
+            for wk in weeks for lang, loc in report["history"][wk].most_common()
+        ]),
+        "authors": (["name", "email", "commits", "added", "removed", "weeks"], [
+            (a["name"], a["email"], a["commits"], a["added"], a["removed"], a["weeks"])
+            for a in sorted(authors.values(), key=lambda a: (-a["commits"], a["name"]))
+        ]),
+        "author_weeks": (["week", "name", "email", "commits", "added", "removed"], [
+            (wk.isoformat(), authors[key]["name"], key, n, added, removed)
+            for (wk, key), (n, added, removed) in sorted(report["author_weeks"].items())
+        ]),
+    }
+    if "files" in stats:
+        tables["files"] = (["path", "lang", "bytes", "loc"] + kinds, stats["files"])
+    if "commits" in report:
+        first, last = (weeks[0], weeks[-1]) if weeks else (None, None)
+        tables["commits"] = (["date", "author", "email", "added", "removed", "files", "merge"], [
+            (cm.date.isoformat(), cm.author, cm.email, cm.added, cm.removed, cm.files, cm.is_merge)
+            for cm in report["commits"]
+            if first is not None and first <= week_start_monday(cm.date) <= last
+        ])
+    if "diagnostics" in report:
+        tables["diagnostics"] = (["section", "name", "value"], diag_rows(report["diagnostics"]))
+    return tables
+
+def write_table_csv(path: str, columns: list, rows):
+    import csv
+
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(columns)
+        w.writerows(rows)
+
+def write_table_parquet(path: str, columns: list, rows):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для --format parquet нужен pyarrow (pip install pyarrow)")
+    rows = list(rows)
+    table = pa.table({col: [r[i] for r in rows] for i, col in enumerate(columns)})
+    pq.write_table(table, path)
+
+def write_json(report: dict, out: str):
+    import json
+
+    doc = {name: [dict(zip(cols, r)) for r in rows] for name, (cols, rows) in report_tables(report).items()}
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh, ensure_ascii=False)
+
+def write_table_dir(report: dict, out: str, write_table, ext: str):
+    # csv/parquet: по файлу на таблицу в каталоге out
+    os.makedirs(out, exist_ok=True)
+    for name, (cols, rows) in report_tables(report).items():
+        write_table(os.path.join(out, f"{name}.{ext}"), cols, rows)
+
+def write_report(report: dict, out: str, fmt: str = "xlsx", streaming: bool = False):
+    if fmt == "xlsx":
+        write_xlsx(report, out, streaming=streaming)
+    elif fmt == "json":
+        write_json(report, out)
+    elif fmt == "csv":
+        write_table_dir(report, out, write_table_csv, "csv")
+    elif fmt == "parquet":
+        write_table_dir(report, out, write_table_parquet, "parquet")
+    else:
+        raise RuntimeError(f"Неизвестный формат: {fmt}")
+
+def read_manifest(path: str) -> list:
+    # CSV с колонками repo[,start,end,name] или YAML-список таких же словарей.
+    # repo — URL для клонирования или путь к локальному репозиторию.
+    import csv
+
+    if path.lower().endswith((".yml", ".yaml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("Для YAML-манифеста нужен PyYAML (pip install pyyaml)")
+        with open(path, encoding="utf-8") as fh:
+            rows = yaml.safe_load(fh) or []
+        if isinstance(rows, dict):
+            rows = rows.get("repos", [])
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+
+    entries = []
+    for i, row in enumerate(rows, start=1):
+        row = {k.strip().lower(): str(v).strip() for k, v in row.items() if k and v not in (None, "")}
+        if not row.get("repo"):
+            raise RuntimeError(f"{path}: в строке {i} не указан repo")
+        entries.append(row)
+    return entries
+
+def repo_slug(repo: str) -> str:
+    # имя каталога/файла для репозитория из манифеста: хвост URL + короткий хэш
+    import hashlib
+    import re
+
+    tail = repo.rstrip("/\\").replace("\\", "/").split("/")[-1].removesuffix(".git")
+    tail = re.sub(r"[^\w.-]+", "_", tail) or "repo"
+    return f"{tail}-{hashlib.sha1(repo.encode()).hexdigest()[:8]}"
+
+def clone_opts(args, start: dt.date) -> dict:
+    return {
+        "mirror": args.mirror,
+        "blobless": args.blobless,
+        "since": week_start_monday(start) if args.shallow else None,
+        "log_since": week_start_monday(start),
+    }
+
+def report_one(entry: dict, args) -> dict:
+    # Выполняется в отдельном процессе пула: клон/fetch, сбор метрик, свой xlsx.
+    # Ошибки не роняют весь пакет, а попадают в сводную строку.
+    name = entry.get("name") or repo_slug(entry["repo"])
+    # до разбора дат в сводке — строки из манифеста, так видно, какая из них кривая
+    summary = {"name": name, "repo": entry["repo"], "start": entry["start"], "end": entry["end"], "error": ""}
+    try:
+        start = summary["start"] = parse_date(entry["start"])
+        end = summary["end"] = parse_date(entry["end"])
+        if os.path.isdir(entry["repo"]):
+            repo_dir = ensure_repo(None, entry["repo"])
+        else:
+            repo_dir = ensure_repo(entry["repo"], None, name=repo_slug(entry["repo"]), **clone_opts(args, start))
+        reset_diag()  # процесс пула обрабатывает несколько репозиториев подряд
+        report = collect_report(repo_dir, start, end, args)
+        if not args.compare:
+            out = os.path.join(args.out, name + (f".{args.format}" if args.format in ("xlsx", "json") else ""))
+            write_report(report, out, args.format, streaming=args.streaming)
+    except Exception as e:
+        summary["error"] = str(e).splitlines()[0] if str(e) else type(e).__name__
+        return summary
+
+    stats = report["stats"]
+    top = stats["loc_by_lang"].most_common(1)
+    summary.update({
+        "commits": sum(report["weekly_commits"].values()),
+        "authors": len(report["authors"]),
+        "active_weeks": sum(1 for wk in report["weeks"] if report["weekly_commits"][wk]),
+        "files": stats["total_files"],
+        "src_files": stats["src_files"],
+        "loc": stats["loc_total"],
+        "mb": round(stats["total_bytes"]/1024/1024, 2),
+        "top_lang": top[0][0] if top else "",
+    })
+    return summary
+
+COMPARISON_COLUMNS = [
+    ("name", "Репозиторий"), ("repo", "Источник"), ("start", "Начало"), ("end", "Конец"),
+    ("commits", "Коммитов"), ("authors", "Авторов"), ("active_weeks", "Активных недель"),
+    ("files", "Файлов"), ("src_files", "Файлов кода"), ("loc", "LOC"), ("mb", "Размер (MB)"),
+    ("top_lang", "Основной язык"), ("error", "Ошибка"),
+]
+
+def comparison_rows(summaries: list) -> list:
+    return [
+        [sm[k].isoformat() if isinstance(sm.get(k), dt.date) else sm.get(k) for k, _ in COMPARISON_COLUMNS]
+        for sm in summaries
+    ]
+
+def write_comparison_xlsx(summaries: list, out: str):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Сравнение"
+    ws["A1"] = "Сводка по репозиториям"
+    ws["A1"].font = Font(bold=True, size=14)
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(COMPARISON_COLUMNS))
+
+    ws.append([title for _, title in COMPARISON_COLUMNS])
+    style_header(ws[2])
+    for row in comparison_rows(summaries):
+        ws.append(row)
+
+    ws.column_dimensions["A"].width = 28
+    ws.column_dimensions["B"].width = 40
+    for col in range(3, 13):
+        ws.column_dimensions[get_column_letter(col)].width = 14
+    ws.column_dimensions["M"].width = 40
+    ws.freeze_panes = "B3"
+    wb.save(out)
+
+def write_comparison(summaries: list, out: str, fmt: str = "xlsx"):
+    cols = [k for k, _ in COMPARISON_COLUMNS]
+    if fmt == "xlsx":
+        write_comparison_xlsx(summaries, out)
+    elif fmt == "json":
+        import json
+        with open(out, "w", encoding="utf-8") as fh:
+            json.dump([dict(zip(cols, r)) for r in comparison_rows(summaries)], fh, ensure_ascii=False)
+    elif fmt == "csv":
+        write_table_csv(out, cols, comparison_rows(summaries))
+    else:
+        write_table_parquet(out, cols, comparison_rows(summaries))
+
+def run_batch(args):
+    from concurrent.futures import ProcessPoolExecutor
+
+    entries = read_manifest(args.manifest)
+    for e in entries:
+        # даты из CLI — значения по умолчанию для строк без start/end
+        e.setdefault("start", args.start)
+        e.setdefault("end", args.end)
+        if not e["start"] or not e["end"]:
+            raise RuntimeError(f"{e['repo']}: нет start/end ни в манифесте, ни в --start/--end")
+    # один repo/name дважды — два процесса пула клонировали бы в один каталог
+    # _repo_tmp/<slug> и писали бы один и тот же файл отчёта
+    for label, key in (("repo", lambda e: e["repo"]),
+                       ("name", lambda e: e.get("name") or repo_slug(e["repo"]))):
+        seen = set()
+        for e in entries:
+            value = key(e)
+            if value in seen:
+                raise RuntimeError(f"{args.manifest}: {label} {value!r} встречается в манифесте дважды")
+            seen.add(value)
+    if not args.compare:
+        os.makedirs(args.out, exist_ok=True)
+
+    # клоны и сканы независимы — раздаём их по ограниченному пулу процессов;
+    # лимит --git-procs делится между процессами пула поровну. Семафор у каждого
+    # процесса свой, поэтому процессов не больше --git-procs: иначе при 1 слоте
+    # на процесс git'ов одновременно было бы столько же, сколько процессов.
+    workers = max(1, min(args.procs, args.git_procs, len(entries) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_git,
+                             initargs=(args.git_timeout, args.git_procs // workers)) as ex:
+        futures = [ex.submit(report_one, e, args) for e in entries]
+        summaries = []
+        for fut in futures:
+            sm = fut.result()
+            summaries.append(sm)
+            if sm["error"]:
+                print(f"FAIL: {sm['name']}: {sm['error']}")
+            else:
+                print(f"OK: {sm['name']}")
+
+    if args.compare:
+        write_comparison(summaries, args.out, args.format)
+        print(f"OK: сводка сохранена в {args.out}")
+    return 1 if any(sm["error"] for sm in summaries) else 0
+
+def profile_startup(argv: list) -> int:
+    # Перезапускаем ту же команду под python -X importtime и печатаем, сколько стоил
+    # каждый импорт верхнего уровня (включая ленивые — они попадают в лог, когда случаются).
+    import subprocess
+
+    cmd = [sys.executable, "-X", "importtime", os.path.abspath(__file__),
+           *[a for a in argv if a != "--profile-startup"]]
+    t0 = time.perf_counter()
+    p = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - t0
 
-    wb.save(args.out)
+    imports = []
+    other = []
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок
+        name = parts[2][1:]
+        if not name.startswith(" "):  # только верхний уровень, вложенные входят в cumulative
+            imports.append((int(parts[1]), name))
+
+    if other:
+        print("\n".join(other), file=sys.stderr)
+    imports.sort(reverse=True)
+    total = sum(us for us, _ in imports)
+    print("\nStartup profile (python -X importtime):")
+    print(f"  {'модуль':<40} {'ms':>8}")
+    for us, name in imports[:20]:
+        print(f"  {name:<40} {us / 1000:8.1f}")
+    print(f"  {'всего импортов':<40} {total / 1000:8.1f}")
+    print(f"  {'время процесса целиком':<40} {wall * 1000:8.1f}")
+    return p.returncode
+
+def run_profiled(func, profiler: str, out: str | None = None):
+    # --profile: весь прогон под cProfile (stdlib) или pyinstrument (если установлен)
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("Для --profile pyinstrument нужен pyinstrument (pip install pyinstrument)")
+        prof = Profiler()
+        prof.start()
+        try:
+            return func()
+        finally:
+            prof.stop()
+            if out:
+                with open(out, "w", encoding="utf-8") as fh:
+                    fh.write(prof.output_html())
+            else:
+                print(prof.output_text(unicode=True))
+
+    import cProfile
+    import pstats
+
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func)
+    finally:
+        if out:
+            prof.dump_stats(out)  # смотреть: python -m pstats, snakeviz
+        else:
+            pstats.Stats(prof).sort_stats("cumulative").print_stats(30)
+
+def run_report(args):
+    start = parse_date(args.start)
+    end = parse_date(args.end)
+
+    with phase("ensure_repo"):
+        repo_dir = ensure_repo(args.repo_url, args.repo_path, **clone_opts(args, start))
+    report = collect_report(repo_dir, start, end, args)
+    with phase("write_report"):
+        write_report(report, args.out, args.format, streaming=args.streaming)
+
+WATCH_DEBOUNCE = 2.0  # после события ФС ждём, пока checkout/pull допишет файлы
+
+def report_digest(report: dict) -> str:
+    # отпечаток чисел отчёта: --watch переписывает файл, только если он изменился
+    import hashlib
+    import json
+
+    tables = report_tables(report)
+    tables.pop("diagnostics", None)  # время фаз меняется при каждом проходе
+    doc = json.dumps(tables, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(doc.encode()).hexdigest()
+
+def fs_trigger(repo_dir: str, out: str):
+    # Event, который взводится при изменениях в репозитории (inotify/FSEvents/
+    # ReadDirectoryChanges через watchdog). Без watchdog — None, и --watch просто
+    # опрашивает раз в --interval: сканирование всё равно читает только изменившиеся файлы.
+    try:
+        from watchdog.events import (EVENT_TYPE_CREATED, EVENT_TYPE_DELETED, EVENT_TYPE_MODIFIED,
+                                     EVENT_TYPE_MOVED, FileSystemEventHandler)
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+    import threading
+
+    event = threading.Event()
+    out = os.path.abspath(out)
+    ignored = EXCLUDE_DIRS - {".git"}
+    # opened/closed/closed_no_write шлёт и простое чтение файла — в том числе наше
+    # собственное сканирование, иначе каждый проход будил бы следующий
+    changes = {EVENT_TYPE_CREATED, EVENT_TYPE_MODIFIED, EVENT_TYPE_DELETED, EVENT_TYPE_MOVED}
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, ev):
+            if ev.event_type not in changes:
+                return
+            path = os.path.abspath(ev.src_path)
+            if path.startswith(out):
+                return  # собственный отчёт
+            rel = os.path.relpath(path, repo_dir).replace(os.sep, "/").split("/")
+            if any(p.lower() in ignored for p in rel):
+                return
+            event.set()
+
+    observer = Observer()
+    observer.daemon = True
+    observer.schedule(Handler(), repo_dir, recursive=True)
+    observer.start()
+    return event
+
+def run_watch(args):
+    # Долгоживущий режим: состояние (история, кэш сканирования, отпечаток отчёта)
+    # остаётся в памяти между проходами. Удалённый репозиторий опрашивается через
+    # ensure_repo (git fetch) раз в --interval, локальный — по событиям ФС или тоже
+    # по таймеру. Ошибка прохода (сеть, блокировка git) не останавливает режим.
+    start = parse_date(args.start)
+    end = parse_date(args.end)
+    state = {}
+    trigger = None
+    print(f"--watch: отчёт {args.out}, интервал {args.interval} s (Ctrl+C — выход)")
+    try:
+        while True:
+            reset_diag()
+            t0 = time.perf_counter()
+            try:
+                with phase("ensure_repo"):
+                    repo_dir = ensure_repo(args.repo_url, args.repo_path, **clone_opts(args, start))
+                if trigger is None:
+                    trigger = (fs_trigger(repo_dir, args.out) if args.repo_path else None) or False
+                report = collect_report(repo_dir, start, end, args, state=state)
+                digest = report_digest(report)
+                if digest != state.get("digest"):
+                    with phase("write_report"):
+                        write_report(report, args.out, args.format, streaming=args.streaming)
+                    state["digest"] = digest
+                    print(f"[{dt.datetime.now():%H:%M:%S}] обновлено: {args.out} "
+                          f"({time.perf_counter() - t0:.1f} s)")
+                if args.stats:
+                    print_diag(DIAG, time.perf_counter() - t0)
+            except RuntimeError as e:
+                print(f"[{dt.datetime.now():%H:%M:%S}] ошибка: {e}", file=sys.stderr)
+            except Exception as e:
+                # занятый SQLite-кэш, файл отчёта открыт в Excel и т.п. — ждём следующего прохода
+                print(f"[{dt.datetime.now():%H:%M:%S}] ошибка: {e.__class__.__name__}: {e}",
+                      file=sys.stderr)
+            if trigger:
+                if trigger.wait(args.interval):
+                    time.sleep(WATCH_DEBOUNCE)
+                trigger.clear()
+            else:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("--watch: остановлено")
+
+def main():
+    if "--profile-startup" in sys.argv[1:]:
+        # до argparse, чтобы профилировать и запуски с ошибкой в аргументах
+        sys.exit(profile_startup(sys.argv[1:]))
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repo-url", default=None)
+    ap.add_argument("--repo-path", default=None)
+    ap.add_argument("--out", required=True, help="xlsx; в пакетном режиме без --compare — каталог для отчётов")
+    ap.add_argument("--start", help="YYYY-MM-DD (например 2025-09-01)")
+    ap.add_argument("--end", help="YYYY-MM-DD (например 2025-12-31)")
+    ap.add_argument("--jobs", type=int, default=1, help="потоков для сканирования файлов (1 = последовательно)")
+    ap.add_argument("--cache", default=SCAN_CACHE_PATH, help="SQLite-кэш сканирования (path, size, mtime -> LOC)")
+    ap.add_argument("--no-cache", action="store_true", help="не использовать кэш сканирования")
+    ap.add_argument("--git-scan", action="store_true",
+                    help="сканировать файлы из git ls-files и считать LOC по блобам (учитывает .gitignore)")
+    ap.add_argument("--no-sniff", action="store_true",
+                    help="решать, что считать кодом, только по расширению (без проверки содержимого)")
+    ap.add_argument("--mailmap", default=None, help="дополнительный .mailmap для объединения авторов")
+    ap.add_argument("--format", choices=["xlsx", "json", "csv", "parquet"], default="xlsx",
+                    help="формат отчёта; для csv/parquet --out — каталог с файлом на таблицу")
+    ap.add_argument("--classify", action="store_true",
+                    help="делить LOC на код, комментарии и пустые строки (по синтаксису комментариев языка)")
+    ap.add_argument("--details", action="store_true",
+                    help="добавить листы «Файлы» и «Коммиты» с построчной детализацией")
+    ap.add_argument("--streaming", action="store_true",
+                    help="писать книгу в write-only режиме openpyxl: ячейки не копятся в памяти "
+                         "(сами данные отчёта, в том числе строки --details, в памяти остаются)")
+    ap.add_argument("--mirror", action="store_true",
+                    help="клонировать в постоянное bare-зеркало _repo_tmp/mirrors и работать через git worktree")
+    ap.add_argument("--blobless", action="store_true",
+                    help="partial clone (--filter=blob:none): из блобов качаются только изменённые с --start "
+                         "(одним запросом после clone/fetch), а не вся история")
+    ap.add_argument("--shallow", action="store_true",
+                    help="качать историю только начиная с --start (--shallow-since)")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="выполнить команду и вывести разбивку времени импортов (холодный старт)")
+    ap.add_argument("--stats", action="store_true",
+                    help="вывести время фаз и счётчики; в отчёт добавить лист/таблицу диагностики")
+    ap.add_argument("--profile", choices=["cprofile", "pyinstrument"], default=None,
+                    help="профилировать весь прогон; без --profile-out — топ функций в консоль")
+    ap.add_argument("--profile-out", default=None,
+                    help="файл профиля (.prof для cprofile, .html для pyinstrument)")
+    ap.add_argument("--watch", action="store_true",
+                    help="не завершаться: следить за репозиторием и переписывать отчёт, когда меняются цифры")
+    ap.add_argument("--interval", type=float, default=30,
+                    help="--watch: период опроса git fetch / файлов, секунд")
+    ap.add_argument("--git-timeout", type=float, default=None,
+                    help="таймаут одной команды git, секунд (по умолчанию без ограничения)")
+    ap.add_argument("--git-procs", type=int, default=GIT_MAX_PROCS,
+                    help="максимум одновременных процессов git (в пакетном режиме — на все процессы пула)")
+    ap.add_argument("--manifest", default=None,
+                    help="пакетный режим: CSV/YAML со списком репозиториев (repo[,start,end,name])")
+    ap.add_argument("--procs", type=int, default=os.cpu_count() or 1,
+                    help="процессов для пакетного режима (не больше --git-procs)")
+    ap.add_argument("--compare", action="store_true",
+                    help="пакетный режим: одна сводная книга вместо книги на каждый репозиторий")
+    args = ap.parse_args()
+
+    if args.classify and args.git_scan:
+        ap.error("--classify пока не поддерживается вместе с --git-scan")
+    configure_git(args.git_timeout, args.git_procs)
+    if args.watch and args.manifest:
+        ap.error("--watch работает с одним репозиторием, без --manifest")
+    if args.manifest:
+        sys.exit(run_batch(args))
+    if not args.start or not args.end:
+        ap.error("нужны --start и --end")
+    if args.watch:
+        run_watch(args)
+        return
+
+    t0 = time.perf_counter()
+    if args.profile:
+        run_profiled(lambda: run_report(args), args.profile, args.profile_out)
+    else:
+        run_report(args)
     print(f"OK: сохранено в {args.out}")
+    if args.stats:
+        print_diag(DIAG, time.perf_counter() - t0)
 
 if __name__ == "__main__":
     main()